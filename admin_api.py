@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import logging
+from dotenv import load_dotenv
+
+import http_client
+from config import SERVER_URL, ADMIN_PASSWORD
+from http_client import ServiceClient
+
+load_dotenv()
+ADMIN_SETUP_MODE = os.getenv("ADMIN_SETUP_MODE", "api") # api or ui
+GATEWAY_PIN = os.getenv("GATEWAY_PIN", "0000")
+
+# Endpoints called by gateway admin frontend
+GATEWAY_AUTH_PATH = os.getenv("GATEWAY_AUTH_PATH", "voting-process-manager-api/token")
+REGISTRATION_STATE_PATH = os.getenv("REGISTRATION_STATE_PATH", "voting-process-manager-api/terminals-registration-state")
+REGISTRATION_START_PATH = os.getenv("REGISTRATION_START_PATH", "voting-process-manager-api/start-terminals-registration")
+ELECTION_STATE_PATH = os.getenv("ELECTION_STATE_PATH", "voting-process-manager-api/election-state")
+ELECTION_START_PATH = os.getenv("ELECTION_START_PATH", "voting-process-manager-api/start-elections")
+
+# Endpoints called by statistics admin, served by server
+STATISTICS_API_URL = os.getenv("STATISTICS_API_URL", SERVER_URL)
+STATISTICS_AUTH_PATH = os.getenv("STATISTICS_AUTH_PATH", "statistics/token")
+RESULTS_STATE_PATH = os.getenv("RESULTS_STATE_PATH", "statistics/results-state")
+RESULTS_PUBLISH_PATH = os.getenv("RESULTS_PUBLISH_PATH", "statistics/publish-results")
+
+logger = logging.getLogger("admin_api")
+
+
+class AdminApiError (Exception):
+    pass
+
+
+class AdminSession:
+    def __init__ (self, client, auth_path, credentials):
+        self.client = client
+        self.auth_path = auth_path
+        self.credentials = credentials
+        self.headers = None
+
+    def login (self):
+        # OAuth2 password form, same as admin frontends send
+        response = self.client.post(self.auth_path, data = self.credentials)
+        if response.status_code != 200:
+            raise AdminApiError("Login to %s failed with status %s" % (self.client.url(self.auth_path), response.status_code))
+        self.headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+
+    def call (self, method, path):
+        if self.headers is None:
+            self.login()
+
+        response = self.client.request(method, path, headers = self.headers, idempotent = method == "GET")
+        if response.status_code != 200:
+            raise AdminApiError("%s %s failed with status %s: %s" % (method, self.client.url(path), response.status_code, response.text[:200]))
+        return response.json()
+
+    def ensure_state (self, description, state_path, change_path):
+        start = time.perf_counter()
+
+        # Skip change if state is already correct
+        if self.call("GET", state_path)["state"]:
+            logger.info("%s already on", description)
+            return False
+
+        self.call("POST", change_path)
+
+        if not self.call("GET", state_path)["state"]:
+            raise AdminApiError("%s still off after %s" % (description, self.client.url(change_path)))
+
+        logger.info("%s turned on in %.2f s", description, time.perf_counter() - start)
+        return True
+
+
+def gateway_session ():
+    return AdminSession(http_client.gateway, GATEWAY_AUTH_PATH, {"username": "admin", "password": GATEWAY_PIN})
+
+
+def statistics_session ():
+    client = http_client.server if STATISTICS_API_URL == SERVER_URL else ServiceClient("statistics_api", STATISTICS_API_URL)
+    return AdminSession(client, STATISTICS_AUTH_PATH, {"username": "admin", "password": ADMIN_PASSWORD})
+
+
+def prepare_stack ():
+    gateway = gateway_session()
+    gateway.ensure_state("Registration", REGISTRATION_STATE_PATH, REGISTRATION_START_PATH)
+    gateway.ensure_state("Elections", ELECTION_STATE_PATH, ELECTION_START_PATH)
+
+    statistics = statistics_session()
+    statistics.ensure_state("Results publishing", RESULTS_STATE_PATH, RESULTS_PUBLISH_PATH)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level = os.getenv("LOG_LEVEL", "INFO"), format = "%(asctime)s %(name)s: %(message)s")
+
+    try:
+        prepare_stack()
+    except AdminApiError as e:
+        sys.exit(str(e))
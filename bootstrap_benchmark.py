@@ -0,0 +1,97 @@
+import time
+import argparse
+
+import requests
+
+import http_client
+from http_client import HTTP_LONG_READ_TIMEOUT
+from results_store import save_run
+from stack_api import StackApiError, elastic_status
+
+CHART_WIDTH = 50
+
+
+def bootstrap_phases (number_of_votes):
+    return [
+        ("import_data", "database/import-data"),
+        ("seed_data", "database/seed-data?number_of_votes=%d" % number_of_votes),
+        ("setup_elastic_index", "elastic/setup-elastic-vote-index"),
+    ]
+
+
+def long_call_error (description, error):
+    if isinstance(error, requests.Timeout):
+        return "%s did not finish within HTTP_LONG_READ_TIMEOUT (%g s)" % (description, HTTP_LONG_READ_TIMEOUT)
+    return "%s failed: %s" % (description, error)
+
+
+def run_phase (name, path):
+    # Seeding many votes takes longer than usual read timeout
+    start = time.perf_counter()
+    try:
+        response = http_client.server.post(path, timeout = http_client.server.long_timeout)
+    except requests.RequestException as e:
+        raise SystemExit(long_call_error("SERVER bootstrap phase %s (%s)" % (name, path), e))
+    duration = time.perf_counter() - start
+
+    if response.status_code != 200:
+        raise SystemExit("SERVER bootstrap phase %s (%s) failed with status %s: %s" % (name, path, response.status_code, response.text[:200]))
+
+    return duration
+
+
+def bootstrap_server (number_of_votes):
+    durations = {}
+
+    for name, path in bootstrap_phases(number_of_votes):
+        durations[name] = run_phase(name, path)
+
+    return durations
+
+
+def run_benchmark (number_of_votes):
+    durations = bootstrap_server(number_of_votes)
+
+    return {
+        "votes": number_of_votes,
+        "durations": durations,
+        "total_duration": sum(durations.values()),
+        "total_votes": elastic_status()["total_votes"],
+    }
+
+
+def print_report (results):
+    phases = list(results[0]["durations"])
+
+    print(("%10s" + " %20s" * len(phases) + " %10s %12s") % tuple(["votes"] + phases + ["total s", "server votes"]))
+    for result in results:
+        print(("%10d" + " %20.2f" * len(phases) + " %10.2f %12d") % tuple([result["votes"]] + [result["durations"][phase] for phase in phases] + [result["total_duration"], result["total_votes"]]))
+
+    # Bootstrap time by vote count
+    longest = max(result["total_duration"] for result in results) or 1
+    print()
+    for result in results:
+        bar = "#" * max(1, round(result["total_duration"] / longest * CHART_WIDTH))
+        print("%10d | %s %.2f s" % (result["votes"], bar, result["total_duration"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure server bootstrap time by number of seeded votes (resets server data!)")
+    parser.add_argument("--votes", type = int, nargs = "+", default = [1, 10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    results = []
+    for number_of_votes in args.votes:
+        try:
+            result = run_benchmark(number_of_votes)
+        except StackApiError as e:
+            raise SystemExit(str(e))
+
+        if result["total_votes"] != number_of_votes:
+            raise SystemExit("SERVER reports %d votes after seeding %d" % (result["total_votes"], number_of_votes))
+
+        results.append(result)
+
+    print_report(results)
+
+    save_run("bootstrap_benchmark", {"bootstrap.%d.%s" % (result["votes"], phase): [seconds] for result in results for phase, seconds in list(result["durations"].items()) + [("total_duration", result["total_duration"])]})
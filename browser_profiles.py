@@ -0,0 +1,139 @@
+import os
+import json
+from dotenv import load_dotenv
+
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+
+load_dotenv()
+BROWSER_PROFILE = os.getenv("BROWSER_PROFILE", "firefox")
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR", "") # empty starts every browser with fresh profile
+CHROMIUM_BINARY = os.getenv("CHROMIUM_BINARY", "")
+
+PROFILES = {
+    "firefox": {"browser": "firefox", "page_load_strategy": "normal", "block_images": False, "block_fonts": False},
+    "firefox-lean": {"browser": "firefox", "page_load_strategy": "eager", "block_images": True, "block_fonts": True},
+    "firefox-none": {"browser": "firefox", "page_load_strategy": "none", "block_images": True, "block_fonts": True},
+    "chromium": {"browser": "chromium", "page_load_strategy": "normal", "block_images": False, "block_fonts": False},
+    "chromium-lean": {"browser": "chromium", "page_load_strategy": "eager", "block_images": True, "block_fonts": True},
+}
+
+# Background traffic of browser competes with tested pages
+FIREFOX_QUIET_PREFERENCES = {
+    "app.update.auto": False,
+    "app.update.enabled": False,
+    "app.normandy.enabled": False,
+    "extensions.update.enabled": False,
+    "browser.search.update": False,
+    "browser.ping-centre.telemetry": False,
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "toolkit.telemetry.enabled": False,
+    "toolkit.telemetry.unified": False,
+    "network.prefetch-next": False,
+}
+
+CHROMIUM_QUIET_ARGUMENTS = [
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--metrics-recording-only",
+    "--no-first-run",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+]
+
+FONT_URL_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+
+
+class BrowserProfile:
+    def __init__ (self, name, browser = "firefox", page_load_strategy = "normal", block_images = False, block_fonts = False, profile_dir = BROWSER_PROFILE_DIR):
+        if browser not in ("firefox", "chromium"):
+            raise ValueError("Unknown browser %s" % browser)
+
+        self.name = name
+        self.browser = browser
+        self.page_load_strategy = page_load_strategy
+        self.block_images = block_images
+        self.block_fonts = block_fonts
+        self.profile_dir = profile_dir
+
+    def firefox_preferences (self):
+        preferences = dict(FIREFOX_QUIET_PREFERENCES)
+        if self.block_images:
+            preferences["permissions.default.image"] = 2
+        if self.block_fonts:
+            preferences["gfx.downloadable_fonts.enabled"] = False
+            preferences["browser.display.use_document_fonts"] = 0
+        return preferences
+
+    def slot_dir (self, slot):
+        # One directory per pooled browser, running browsers lock their profile
+        if not self.profile_dir:
+            return None
+
+        path = os.path.abspath(os.path.join(self.profile_dir, self.name, str(slot)))
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        # Firefox reads user.js of existing profile on every start
+        if self.browser == "firefox":
+            with open(os.path.join(path, "user.js"), "w") as user_file:
+                for name, value in sorted(self.firefox_preferences().items()):
+                    user_file.write("user_pref(%s, %s);\n" % (json.dumps(name), json.dumps(value)))
+
+        return path
+
+    def options (self, slot = 0):
+        path = self.slot_dir(slot)
+
+        if self.browser == "firefox":
+            options = FirefoxOptions()
+            options.headless = True
+            for name, value in self.firefox_preferences().items():
+                options.set_preference(name, value)
+            if path:
+                options.add_argument("-profile")
+                options.add_argument(path)
+        else:
+            options = ChromeOptions()
+            options.headless = True
+            if CHROMIUM_BINARY:
+                options.binary_location = CHROMIUM_BINARY
+            for argument in CHROMIUM_QUIET_ARGUMENTS:
+                options.add_argument(argument)
+            if self.block_images:
+                options.add_argument("--blink-settings=imagesEnabled=false")
+            if path:
+                options.add_argument("--user-data-dir=%s" % path)
+
+        # Explicit waits of tester decide when page is ready
+        options.set_capability("pageLoadStrategy", self.page_load_strategy)
+        return options
+
+    def prepare (self, driver):
+        # Chromium has no switch for web fonts, block their requests instead
+        if self.browser == "chromium" and self.block_fonts:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": FONT_URL_PATTERNS})
+
+
+def load_profile (name = BROWSER_PROFILE):
+    if name not in PROFILES:
+        raise SystemExit("Unknown BROWSER_PROFILE %s, choose from %s" % (name, ", ".join(PROFILES)))
+
+    settings = dict(PROFILES[name])
+
+    # Single settings can be changed without defining new profile
+    if os.getenv("BROWSER_PAGE_LOAD_STRATEGY"):
+        settings["page_load_strategy"] = os.getenv("BROWSER_PAGE_LOAD_STRATEGY")
+    for setting in ("block_images", "block_fonts"):
+        value = os.getenv("BROWSER_" + setting.upper())
+        if value:
+            settings[setting] = value == "1"
+
+    return BrowserProfile(name, **settings)
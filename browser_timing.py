@@ -0,0 +1,127 @@
+import os
+import json
+from dotenv import load_dotenv
+
+from metrics import LatencyRecorder
+from selenium_helper import click_on
+
+load_dotenv()
+BROWSER_TIMING = os.getenv("BROWSER_TIMING", "1") == "1"
+BROWSER_TIMING_REPORT_PATH = os.getenv("BROWSER_TIMING_REPORT_PATH", "browser_timing_report.json")
+BROWSER_BUDGETS_PATH = os.getenv("BROWSER_BUDGETS_PATH", "browser_budgets.json")
+BROWSER_BUDGET_STATISTIC = os.getenv("BROWSER_BUDGET_STATISTIC", "p95") # median, p95, p99 or max
+
+# Milliseconds since navigation start, read once key element of page is present
+NAVIGATION_SCRIPT = """
+var navigation = performance.getEntriesByType("navigation")[0];
+if (!navigation) {
+    return null;
+}
+var paints = {};
+performance.getEntriesByType("paint").forEach(function (entry) { paints[entry.name] = entry.startTime; });
+var resources = performance.getEntriesByType("resource");
+var metrics = {
+    ttfb: navigation.responseStart,
+    dom_interactive: navigation.domInteractive,
+    dom_content_loaded: navigation.domContentLoadedEventEnd,
+    load: navigation.loadEventEnd || null,
+    first_paint: paints["first-paint"] || null,
+    first_contentful_paint: paints["first-contentful-paint"] || null,
+    interactive: performance.now(),
+    resources: resources.length,
+    transfer_bytes: resources.reduce(function (sum, entry) { return sum + (entry.transferSize || 0); }, 0),
+    slowest_resource: resources.reduce(function (slowest, entry) { return Math.max(slowest, entry.duration); }, 0)
+};
+performance.clearResourceTimings();
+return metrics;
+"""
+
+# Clicks and resolves after the frame rendered by click handlers
+CLICK_SCRIPT = """
+var element = arguments[0];
+var done = arguments[arguments.length - 1];
+var start = performance.now();
+element.click();
+requestAnimationFrame(function () {
+    setTimeout(function () { done([start, performance.now() - start]); }, 0);
+});
+"""
+
+INTERACTION_SCRIPT = """
+var start = arguments[0];
+var resources = performance.getEntriesByType("resource").filter(function (entry) { return entry.startTime >= start; });
+var metrics = {
+    interactive: performance.now() - start,
+    resources: resources.length,
+    transfer_bytes: resources.reduce(function (sum, entry) { return sum + (entry.transferSize || 0); }, 0)
+};
+performance.clearResourceTimings();
+return metrics;
+"""
+
+recorder = LatencyRecorder()
+
+
+def record (page, metrics):
+    for metric, value in (metrics or {}).items():
+        if value is not None:
+            recorder.record("%s.%s" % (page, metric), value)
+
+
+def capture_navigation (driver, page):
+    if BROWSER_TIMING:
+        record(page, driver.execute_script(NAVIGATION_SCRIPT))
+
+
+def timed_click (driver, page, element, ready = None):
+    if not BROWSER_TIMING:
+        click_on(driver, element)
+        if ready is not None:
+            ready()
+        return
+
+    start, next_paint = driver.execute_async_script(CLICK_SCRIPT, element)
+    if ready is not None:
+        ready()
+
+    metrics = driver.execute_script(INTERACTION_SCRIPT, start)
+    metrics["next_paint"] = next_paint
+    record(page, metrics)
+
+
+def summary_by_page (recorder = recorder):
+    pages = {}
+    for name, stats in recorder.summary().items():
+        page, metric = name.split(".", 1)
+        pages.setdefault(page, {})[metric] = stats
+    return pages
+
+
+def write_report (path = BROWSER_TIMING_REPORT_PATH, recorder = recorder):
+    pages = summary_by_page(recorder)
+    with open(path, "w") as report_file:
+        json.dump(pages, report_file, indent = 2)
+    return pages
+
+
+def load_budgets (path = BROWSER_BUDGETS_PATH):
+    # Page and metric to limit in milliseconds, bytes or count, e.g. {"party": {"interactive": 2000}}
+    try:
+        with open(path) as budgets_file:
+            return json.load(budgets_file)
+    except OSError:
+        return {}
+
+
+def check_budgets (pages, budgets, statistic = BROWSER_BUDGET_STATISTIC):
+    violations = []
+
+    for page, limits in budgets.items():
+        for metric, limit in limits.items():
+            stats = pages.get(page, {}).get(metric)
+            if stats is None:
+                continue
+            if stats[statistic] > limit:
+                violations.append("BROWSER %s %s %s is %.0f, budget %.0f" % (page, metric, statistic, stats[statistic], limit))
+
+    return violations
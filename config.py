@@ -0,0 +1,16 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+VT_URL = os.getenv("VT_URL")
+VT_FRONTEND_URL = VT_URL + "frontend/"
+VT_BACKEND_URL = VT_URL + "backend/"
+GATEWAY_URL = os.getenv("GATEWAY_URL")
+GATEWAY_ADMIN_URL = GATEWAY_URL + "admin-frontend/"
+SERVER_URL = os.getenv("SERVER_URL")
+STATISTICS_URL = os.getenv("STATISTICS_URL")
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+
+# Path of VT backend endpoint used by frontend to send vote
+VT_VOTE_PATH = os.getenv("VT_VOTE_PATH", "api/vote")
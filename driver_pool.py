@@ -0,0 +1,211 @@
+import os
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from selenium import webdriver
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import WebDriverException
+
+from webdriver_manager.firefox import GeckoDriverManager
+from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.core.os_manager import ChromeType
+
+from browser_profiles import load_profile
+from selenium_helper import PAGE_LONG_LOAD_DELAY, load_page, page_loaded, record_origin, take_visited_origins
+
+load_dotenv()
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "1"))
+DRIVER_MAX_USES = int(os.getenv("DRIVER_MAX_USES", "20"))
+DRIVER_CACHE_PATH = os.getenv("DRIVER_CACHE_PATH", ".driver_cache.json")
+DRIVER_ACQUIRE_TIMEOUT = float(os.getenv("DRIVER_ACQUIRE_TIMEOUT", "300")) # seconds
+
+DRIVER_MANAGERS = {
+    "firefox": ("geckodriver", lambda: GeckoDriverManager().install()),
+    "chromium": ("chromedriver", lambda: ChromeDriverManager(chrome_type = ChromeType.CHROMIUM).install()),
+}
+
+_driver_path_lock = threading.Lock()
+_driver_paths = {}
+
+
+def resolve_driver_path (browser = "firefox"):
+    name, install = DRIVER_MANAGERS[browser]
+
+    with _driver_path_lock:
+        if _driver_paths.get(name) and os.path.isfile(_driver_paths[name]):
+            return _driver_paths[name]
+
+        # Reuse driver resolved by previous run
+        try:
+            with open(DRIVER_CACHE_PATH) as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            cache = {}
+
+        if cache.get(name) and os.path.isfile(cache[name]):
+            _driver_paths[name] = cache[name]
+            return _driver_paths[name]
+
+        _driver_paths[name] = cache[name] = install()
+
+        try:
+            with open(DRIVER_CACHE_PATH, "w") as cache_file:
+                json.dump(cache, cache_file)
+        except OSError:
+            pass
+
+        return _driver_paths[name]
+
+
+class DriverPool:
+    def __init__ (self, profile = None, size = DRIVER_POOL_SIZE, max_uses = DRIVER_MAX_USES):
+        self.profile = profile or load_profile()
+        self.size = size
+        self.max_uses = max_uses
+        self.uses = {}
+        self.slots = {}
+        self.used_slots = set()
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+        self.closed = False
+
+    def start (self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+
+        # Start all browsers at once, cold start is the slow part
+        with ThreadPoolExecutor(max_workers = self.size) as executor:
+            futures = [executor.submit(self.create_driver) for i in range(self.size)]
+
+        # Empty slot is filled by acquire, which reports failure to its caller
+        for future in futures:
+            self.idle.put(future.result() if future.exception() is None else None)
+
+    def create_driver (self):
+        # Slot picks profile directory not used by other running browser
+        with self.lock:
+            slot = min(set(range(len(self.used_slots) + 1)) - self.used_slots)
+            self.used_slots.add(slot)
+
+        try:
+            options = self.profile.options(slot)
+            if self.profile.browser == "firefox":
+                driver = webdriver.Firefox(executable_path = resolve_driver_path("firefox"), options = options)
+            else:
+                driver = webdriver.Chrome(executable_path = resolve_driver_path("chromium"), options = options)
+            self.profile.prepare(driver)
+        except Exception:
+            with self.lock:
+                self.used_slots.discard(slot)
+            raise
+
+        with self.lock:
+            self.uses[driver] = 0
+            self.slots[driver] = slot
+        return driver
+
+    def acquire (self, timeout = DRIVER_ACQUIRE_TIMEOUT):
+        self.start()
+        try:
+            driver = self.idle.get(timeout = timeout)
+        except queue.Empty:
+            raise TimeoutError("No browser released within %g s" % timeout)
+
+        if driver is None:
+            try:
+                driver = self.create_driver()
+            except Exception:
+                # Slot stays in pool for next attempt
+                self.idle.put(None)
+                raise
+
+        with self.lock:
+            self.uses[driver] += 1
+
+        return driver
+
+    def release (self, driver, broken = False):
+        with self.lock:
+            worn_out = self.uses.get(driver, 0) >= self.max_uses
+
+        if not broken and not worn_out:
+            try:
+                self.reset(driver)
+            except WebDriverException:
+                broken = True
+
+        if broken or worn_out:
+            self.discard(driver)
+            if not self.closed:
+                # Replacement is started by next acquire
+                self.idle.put(None)
+            return
+
+        if self.closed:
+            self.discard(driver)
+            return
+
+        self.idle.put(driver)
+
+    def reset (self, driver):
+        # Page may have left its origin by link or redirect
+        record_origin(driver, driver.current_url)
+        origins = sorted(take_visited_origins(driver))
+
+        if self.profile.browser == "chromium":
+            self.reset_chromium(driver, origins)
+        else:
+            self.reset_firefox(driver, origins)
+        driver.get("about:blank")
+
+    def reset_chromium (self, driver, origins):
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in origins:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+
+    def reset_firefox (self, driver, origins):
+        # Cookies and storage are reachable only from a page of their origin
+        for origin in origins:
+            # Not a page load of tests, it stays out of timings and wait history
+            load_page(driver, origin + "/")
+            WebDriverWait(driver, PAGE_LONG_LOAD_DELAY).until(page_loaded)
+            try:
+                driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            except WebDriverException:
+                if not self.is_alive(driver):
+                    raise
+            driver.delete_all_cookies()
+
+    def is_alive (self, driver):
+        try:
+            driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def discard (self, driver):
+        with self.lock:
+            self.uses.pop(driver, None)
+            self.used_slots.discard(self.slots.pop(driver, None))
+
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def close (self):
+        self.closed = True
+
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if driver is not None:
+                self.discard(driver)
@@ -0,0 +1,83 @@
+import time
+import argparse
+
+import requests
+
+import http_client
+from bootstrap_benchmark import run_phase, long_call_error
+from results_store import save_run
+from stack_api import StackApiError, elastic_status, elastic_pending, elastic_synchronize, elastic_synchronized
+
+MAX_SYNCHRONIZE_CALLS = 100000
+
+
+def seed_server (number_of_votes):
+    run_phase("seed_data", "database/seed-data?number_of_votes=%d" % number_of_votes)
+
+    # Fresh index so that every batch size indexes the same votes
+    run_phase("setup_elastic_index", "elastic/setup-elastic-vote-index")
+
+
+def run_sweep_step (number_of_votes, batch_size):
+    seed_server(number_of_votes)
+
+    calls = 0
+    synchronize_duration = 0
+    start = time.perf_counter()
+
+    while elastic_pending(elastic_status()) > 0:
+        if calls >= MAX_SYNCHRONIZE_CALLS:
+            raise SystemExit("Elastic not synchronized after %d calls of batch size %d" % (calls, batch_size))
+
+        call_start = time.perf_counter()
+        try:
+            response = elastic_synchronize(batch_size, timeout = http_client.server.long_timeout)
+        except requests.RequestException as e:
+            raise SystemExit(long_call_error("SERVER elastic synchronization", e))
+        synchronize_duration += time.perf_counter() - call_start
+        calls += 1
+
+        if not elastic_synchronized(response):
+            raise SystemExit("Unexpected elastic synchronization response with status %s: %s" % (response.status_code, response.text[:200]))
+
+    completion_duration = time.perf_counter() - start
+
+    return {
+        "votes": number_of_votes,
+        "batch_size": batch_size,
+        "calls": calls,
+        "synchronize_duration": synchronize_duration,
+        "completion_duration": completion_duration,
+        "throughput": number_of_votes / completion_duration if completion_duration else 0,
+    }
+
+
+def print_report (results):
+    best = max(results, key = lambda result: result["throughput"])
+
+    print("%10s %10s %8s %12s %14s %12s" % ("votes", "batch", "calls", "sync s", "completion s", "votes/s"))
+    for result in results:
+        print("%10d %10d %8d %12.2f %14.2f %12.1f%s" % (
+            result["votes"],
+            result["batch_size"],
+            result["calls"],
+            result["synchronize_duration"],
+            result["completion_duration"],
+            result["throughput"],
+            " <- best" if result is best else "",
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Find elastic synchronization batch size with best throughput (resets server data!)")
+    parser.add_argument("--votes", type = int, default = 10000)
+    parser.add_argument("--batch-size", type = int, nargs = "+", default = [10, 100, 500, 1000, 5000])
+    args = parser.parse_args()
+
+    try:
+        results = [run_sweep_step(args.votes, batch_size) for batch_size in args.batch_size]
+    except StackApiError as e:
+        raise SystemExit(str(e))
+    print_report(results)
+
+    save_run("es_sweep", {"elastic.%d.%d.throughput" % (result["votes"], result["batch_size"]): [result["throughput"]] for result in results})
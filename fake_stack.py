@@ -0,0 +1,348 @@
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config import VT_VOTE_PATH
+from vote_ledger import SERVER_RESULTS_PATH
+
+# Stand-in results endpoint, tester reads it when SERVER_RESULTS_PATH points here
+FAKE_RESULTS_PATH = SERVER_RESULTS_PATH or "results"
+from admin_api import (
+    GATEWAY_AUTH_PATH, REGISTRATION_STATE_PATH, REGISTRATION_START_PATH, ELECTION_STATE_PATH, ELECTION_START_PATH,
+    STATISTICS_AUTH_PATH, RESULTS_STATE_PATH, RESULTS_PUBLISH_PATH,
+)
+
+SERVICES = ["vt", "gateway", "server", "statistics"]
+
+CATALOGUE = {
+    "parties": [
+        {"_id": 1, "name": "KDH", "candidates": [
+            {"_id": 101, "degrees_before": "", "first_name": "Milan", "last_name": "Majerský"},
+            {"_id": 102, "degrees_before": "Ing.", "first_name": "Anna", "last_name": "Záborská"},
+        ]},
+        {"_id": 2, "name": "OĽaNO", "candidates": [
+            {"_id": 201, "degrees_before": "Ing.", "first_name": "Igor", "last_name": "Matovič"},
+            {"_id": 202, "degrees_before": "", "first_name": "Eduard", "last_name": "Heger"},
+        ]},
+        {"_id": 3, "name": "SaS", "candidates": [
+            {"_id": 301, "degrees_before": "Ing.", "first_name": "Richard", "last_name": "Sulík"},
+        ]},
+        {"_id": 4, "name": "SME RODINA", "candidates": [
+            {"_id": 401, "degrees_before": "Mgr.", "first_name": "Boris", "last_name": "Kollár"},
+            {"_id": 402, "degrees_before": "", "first_name": "Ľuboš", "last_name": "Krajčír"},
+            {"_id": 403, "degrees_before": "Mgr.", "first_name": "Jozef", "last_name": "Mozol"},
+            {"_id": 404, "degrees_before": "", "first_name": "Petra", "last_name": "Krištúfková"},
+            {"_id": 405, "degrees_before": "", "first_name": "Milan", "last_name": "Krajniak"},
+            {"_id": 406, "degrees_before": "Ing.", "first_name": "Peter", "last_name": "Pčolinský"},
+        ]},
+    ],
+}
+
+HTML_PAGE = "<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head><body><main>%s</main></body></html>"
+
+
+class FakeStack:
+    def __init__ (self, host = "127.0.0.1", port = 9000, latency = 0.005, jitter = 0.0, item_latency = 0.0001):
+        self.host = host
+        self.ports = {service: port + index for index, service in enumerate(SERVICES)}
+        self.latency = latency
+        self.jitter = jitter
+        self.item_latency = item_latency
+        self.lock = threading.Lock()
+        self.servers = []
+        self.reset()
+
+    def reset (self):
+        with self.lock:
+            self.tokens = {}
+            self.inserted_token = None
+            self.gateway_votes = []
+            self.synchronized = 0
+            self.server_votes = 0
+            self.server_ballots = []
+            self.indexed = 0
+            self.states = {"registration": False, "elections": False, "results": False}
+
+    def url (self, service):
+        return "http://%s:%d/" % (self.host, self.ports[service])
+
+    def env (self):
+        return {
+            "VT_URL": self.url("vt"),
+            "GATEWAY_URL": self.url("gateway"),
+            "SERVER_URL": self.url("server"),
+            "STATISTICS_URL": self.url("statistics"),
+        }
+
+    def delay (self, items = 0):
+        seconds = self.latency + random.uniform(0, self.jitter) + items * self.item_latency
+        if seconds > 0:
+            time.sleep(seconds)
+
+    # VT
+    def vt_frontend (self, body, query):
+        return 200, HTML_PAGE % "<div>Načítajte NFC tag</div>"
+
+    def vt_backend (self, body, query):
+        return 200, {"status": "ok"}
+
+    def vt_insert_token (self, body, query):
+        with self.lock:
+            if self.tokens.get(body) != "active":
+                return 403, {"detail": "Token is not active"}
+            self.inserted_token = body
+        return 200, {"status": "ok"}
+
+    def vt_vote (self, body, query):
+        with self.lock:
+            if self.inserted_token is None:
+                return 403, {"detail": "No token inserted"}
+            if not self.states["elections"]:
+                return 403, {"detail": "Elections are not running"}
+            self.tokens[self.inserted_token] = "used"
+            self.gateway_votes.append({"token": self.inserted_token, "party_id": body.get("party_id"), "candidate_ids": body.get("candidate_ids", [])})
+            self.inserted_token = None
+        return 200, {"status": "success"}
+
+    # Gateway
+    def create_token (self, body, query):
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = "created"
+        return 200, {"token": token}
+
+    def activate_token (self, body, query):
+        with self.lock:
+            if self.tokens.get(body.get("token")) != "created":
+                return 400, {"detail": "Unknown token"}
+            self.tokens[body["token"]] = "active"
+        return 200, {"status": "ok"}
+
+    def gateway_statistics (self, body, query):
+        with self.lock:
+            all_count = len(self.gateway_votes)
+            return 200, {"statistics": {"all_count": all_count, "syncronized_count": self.synchronized, "unsyncronized_count": all_count - self.synchronized}}
+
+    def synchronize (self, body, query):
+        with self.lock:
+            pending = len(self.gateway_votes) - self.synchronized
+        self.delay(pending)
+        with self.lock:
+            # Overlapping call may have synchronized the same votes meanwhile
+            pending = min(pending, len(self.gateway_votes) - self.synchronized)
+            self.server_ballots += self.gateway_votes[self.synchronized:self.synchronized + pending]
+            self.synchronized += pending
+            self.server_votes += pending
+        return 200, {"status": "success", "synchronized": pending}
+
+    def statevector_config (self, body, query):
+        return 200, CATALOGUE
+
+    def service_root (self, body, query):
+        return 200, {"status": "ok"}
+
+    def login (self, body, query):
+        return 200, {"access_token": uuid.uuid4().hex, "token_type": "bearer"}
+
+    def state_handlers (self, name):
+        def read_state (body, query):
+            return 200, {"state": self.states[name]}
+
+        def turn_on (body, query):
+            with self.lock:
+                self.states[name] = True
+            return 200, {"status": "success"}
+
+        return read_state, turn_on
+
+    # Server
+    def import_data (self, body, query):
+        return 200, {"status": "success"}
+
+    def seed_data (self, body, query):
+        number_of_votes = int(query.get("number_of_votes", ["0"])[0])
+        self.delay(number_of_votes)
+        with self.lock:
+            # Seeded votes carry no ballot
+            self.server_votes = number_of_votes
+            self.server_ballots = [None] * number_of_votes
+            self.indexed = 0
+        return 200, {"status": "success", "number_of_votes": number_of_votes}
+
+    def setup_elastic_index (self, body, query):
+        with self.lock:
+            self.indexed = 0
+        return 200, {"status": "success"}
+
+    def synchronization_status (self, body, query):
+        with self.lock:
+            return 200, {"status": "success", "data": {"total_votes": self.server_votes, "synchronized_votes": self.indexed, "unsynchronized_votes": self.server_votes - self.indexed}}
+
+    def synchronize_elastic (self, body, query):
+        with self.lock:
+            count = min(int(body.get("number", 0)), self.server_votes - self.indexed)
+        self.delay(count)
+        with self.lock:
+            count = min(count, self.server_votes - self.indexed)
+            self.indexed += count
+        return 200, {"status": "success", "message": "%d votes were successfully synchronized" % count}
+
+    def results (self, body, query):
+        with self.lock:
+            ballots = [ballot for ballot in self.server_ballots[:self.indexed] if ballot and ballot["party_id"] is not None]
+
+        parties = []
+        for party in CATALOGUE["parties"]:
+            party_ballots = [ballot for ballot in ballots if ballot["party_id"] == party["_id"]]
+            candidates = [dict(candidate, votes = sum(candidate["_id"] in ballot["candidate_ids"] for ballot in party_ballots)) for candidate in party["candidates"]]
+            parties.append({"name": party["name"], "votes": len(party_ballots), "candidates": candidates})
+        return 200, {"status": "success", "data": {"parties": parties}}
+
+    # Statistics
+    def statistics_page (self, body, query):
+        with self.lock:
+            if not self.states["results"]:
+                return 200, HTML_PAGE % "<div>Výsledky ešte neboli publikované</div>"
+            total = self.indexed
+
+        return 200, HTML_PAGE % (
+            "<div class=\"elections-statistics\"><table><tbody>"
+            "<tr><th>Počet hlasov spolu:</th><td>%d</td></tr>"
+            "</tbody></table></div>" % total
+        )
+
+    def routes (self):
+        registration_state, start_registration = self.state_handlers("registration")
+        election_state, start_elections = self.state_handlers("elections")
+        results_state, publish_results = self.state_handlers("results")
+
+        return {
+            "vt": {
+                ("GET", "frontend/"): self.vt_frontend,
+                ("GET", "backend/"): self.vt_backend,
+                ("POST", "backend/token"): self.vt_insert_token,
+                ("POST", "backend/" + VT_VOTE_PATH): self.vt_vote,
+            },
+            "gateway": {
+                ("POST", "token-manager-api/tokens/create"): self.create_token,
+                ("POST", "token-manager-api/tokens/writer/update"): self.activate_token,
+                ("POST", "synchronization-service-api/statistics"): self.gateway_statistics,
+                ("POST", "synchronization-service-api/synchronize"): self.synchronize,
+                ("GET", "statevector/config/config.json"): self.statevector_config,
+                ("GET", "voting-service-api/"): self.service_root,
+                ("GET", "voting-process-manager-api/"): self.service_root,
+                ("POST", GATEWAY_AUTH_PATH): self.login,
+                ("GET", REGISTRATION_STATE_PATH): registration_state,
+                ("POST", REGISTRATION_START_PATH): start_registration,
+                ("GET", ELECTION_STATE_PATH): election_state,
+                ("POST", ELECTION_START_PATH): start_elections,
+            },
+            "server": {
+                ("GET", ""): self.service_root,
+                ("POST", "database/import-data"): self.import_data,
+                ("POST", "database/seed-data"): self.seed_data,
+                ("POST", "elastic/setup-elastic-vote-index"): self.setup_elastic_index,
+                ("GET", "elastic/synchronization-status"): self.synchronization_status,
+                ("POST", "elastic/synchronize-votes-es"): self.synchronize_elastic,
+                ("GET", FAKE_RESULTS_PATH): self.results,
+                ("POST", STATISTICS_AUTH_PATH): self.login,
+                ("GET", RESULTS_STATE_PATH): results_state,
+                ("POST", RESULTS_PUBLISH_PATH): publish_results,
+            },
+            "statistics": {
+                ("GET", ""): self.statistics_page,
+            },
+        }
+
+    def handler_class (self, routes):
+        stack = self
+
+        class Handler (BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            # Headers and body are written separately, Nagle would delay the body
+            disable_nagle_algorithm = True
+
+            def handle_request (self, method):
+                url = urlsplit(self.path)
+                route = routes.get((method, url.path.lstrip("/")))
+
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+
+                if route is None:
+                    return self.reply(404, {"detail": "Not Found"})
+
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    body = json.loads(raw_body or b"null")
+                else:
+                    body = parse_qs(raw_body.decode())
+
+                stack.delay()
+                self.reply(*route(body, parse_qs(url.query)))
+
+            def reply (self, status, content):
+                if isinstance(content, str):
+                    payload = content.encode()
+                    content_type = "text/html; charset=utf-8"
+                else:
+                    payload = json.dumps(content).encode()
+                    content_type = "application/json"
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET (self):
+                self.handle_request("GET")
+
+            def do_POST (self):
+                self.handle_request("POST")
+
+            def log_message (self, format, *args):
+                pass
+
+        return Handler
+
+    def start (self):
+        for service, routes in self.routes().items():
+            server = ThreadingHTTPServer((self.host, self.ports[service]), self.handler_class(routes))
+            server.daemon_threads = True
+            threading.Thread(target = server.serve_forever, daemon = True).start()
+            self.servers.append(server)
+        return self
+
+    def stop (self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serve local stand-in of VT, gateway, server and statistics")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 9000, help = "first of four consecutive ports")
+    parser.add_argument("--latency", type = float, default = 0.005, help = "seconds added to every request")
+    parser.add_argument("--jitter", type = float, default = 0.0, help = "maximum random seconds added to latency")
+    parser.add_argument("--item-latency", type = float, default = 0.0001, help = "seconds per vote in synchronize and seed calls")
+    args = parser.parse_args()
+
+    stack = FakeStack(args.host, args.port, args.latency, args.jitter, args.item_latency).start()
+
+    for key, value in stack.env().items():
+        print("%s=%s" % (key, value))
+    sys.stdout.flush()
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stack.stop()
@@ -0,0 +1,374 @@
+import sys
+import json
+import time
+import random
+import socket
+import struct
+import argparse
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+from config import GATEWAY_URL, SERVER_URL, VT_URL
+from http_client import ServiceClient, HTTP_CONNECT_TIMEOUT
+from http_voting import Ballot, HttpVoter, VotingError, parse_candidates
+from sync_benchmark import drain
+from stack_api import StackApiError, gateway_statistics, gateway_synchronize, elastic_status
+
+CHUNK_SIZE = 65536
+OUTAGE_MODES = ["reset", "blackhole"]
+PROXIED_LINKS = ["gateway", "vt", "server", "none"]
+
+
+class FaultProxy:
+    def __init__ (self, target_url, port = 0, host = "127.0.0.1", latency = 0.0, jitter = 0.0, bandwidth = None, drop_rate = 0.0, seed = None):
+        target = urlsplit(target_url)
+        self.target_url = target_url
+        self.target = (target.hostname, target.port or 80)
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth # bytes per second and direction
+        self.drop_rate = drop_rate
+        self.down = None # None, reset or blackhole
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sockets = set()
+        self.listener = None
+        self.stats = {"connections": 0, "bytes": 0, "dropped": 0, "refused": 0}
+
+    def url (self):
+        # Same base path as proxied service, only host and port differ
+        target = urlsplit(self.target_url)
+        return urlunsplit((target.scheme, "%s:%d" % (self.host, self.port), target.path, target.query, target.fragment))
+
+    def set (self, **settings):
+        with self.lock:
+            for name, value in settings.items():
+                if not hasattr(self, name) or name in ("target", "host", "port"):
+                    raise ValueError("Unknown proxy setting %s" % name)
+                setattr(self, name, value)
+
+        if settings.get("down") == "reset":
+            self.cut_connections()
+
+    def count (self, name, value = 1):
+        with self.lock:
+            self.stats[name] += value
+
+    def start (self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(128)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target = self.accept, daemon = True).start()
+        return self
+
+    def stop (self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        self.cut_connections()
+
+    def accept (self):
+        while self.listener is not None:
+            try:
+                client, address = self.listener.accept()
+            except OSError:
+                return
+
+            if self.down == "reset":
+                self.count("refused")
+                self.reset(client)
+                continue
+
+            threading.Thread(target = self.connect, args = (client,), daemon = True).start()
+
+    def connect (self, client):
+        try:
+            upstream = socket.create_connection(self.target, timeout = HTTP_CONNECT_TIMEOUT)
+        except OSError:
+            self.count("refused")
+            self.reset(client)
+            return
+
+        upstream.settimeout(None)
+        for connection in (client, upstream):
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            self.sockets.update((client, upstream))
+            self.stats["connections"] += 1
+
+        threading.Thread(target = self.pump, args = (client, upstream), daemon = True).start()
+        threading.Thread(target = self.pump, args = (upstream, client), daemon = True).start()
+
+    def pump (self, source, destination):
+        while True:
+            try:
+                data = source.recv(CHUNK_SIZE)
+            except OSError:
+                data = b""
+
+            if not data:
+                self.close(source, destination)
+                return
+
+            # Link is gone but sockets stay open, peers wait for timeouts
+            if self.down == "blackhole":
+                continue
+
+            if self.down == "reset" or (self.drop_rate and self.rng.random() < self.drop_rate):
+                self.count("dropped")
+                self.reset(source)
+                self.reset(destination)
+                return
+
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            if self.bandwidth:
+                delay += len(data) / self.bandwidth
+            if delay > 0:
+                time.sleep(delay)
+
+            try:
+                destination.sendall(data)
+            except OSError:
+                self.close(source, destination)
+                return
+            self.count("bytes", len(data))
+
+    def reset (self, connection):
+        # Zero linger sends RST, peer sees connection reset instead of clean close
+        try:
+            connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        except OSError:
+            pass
+        self.close(connection)
+
+    def close (self, *connections):
+        for connection in connections:
+            with self.lock:
+                self.sockets.discard(connection)
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+    def cut_connections (self):
+        with self.lock:
+            connections = list(self.sockets)
+        for connection in connections:
+            self.reset(connection)
+
+
+def load_script (path):
+    # List of {"at": seconds, setting: value}, e.g. {"at": 10, "down": "reset"}, {"at": 40, "down": null}
+    with open(path) as script_file:
+        return sorted(json.load(script_file), key = lambda phase: phase["at"])
+
+
+def outage_script (start, duration, mode):
+    return [{"at": start, "down": mode}, {"at": start + duration, "down": None}]
+
+
+def run_script (proxies, script, stop):
+    start = time.monotonic()
+    for phase in script:
+        if stop.wait(max(0, start + phase["at"] - time.monotonic())):
+            return
+        settings = {name: value for name, value in phase.items() if name != "at"}
+        for proxy in proxies:
+            proxy.set(**settings)
+
+
+def stack_counts ():
+    # Read directly, not through proxy
+    statistics = gateway_statistics()
+    return {"gateway_all": statistics["all_count"], "gateway_synchronized": statistics["syncronized_count"], "server_total": elastic_status()["total_votes"]}
+
+
+def measure_recovery (proxies, clients, script, votes, rate, ballot, sync_interval, timeout):
+    outcomes = {"accepted": 0, "failed": 0, "unknown": 0}
+    sync_calls = {"ok": 0, "failed": 0}
+
+    # Start from empty backlog
+    drain()
+    before = stack_counts()
+
+    stop = threading.Event()
+    script_thread = threading.Thread(target = run_script, args = (proxies, script, stop), daemon = True)
+
+    def cast_votes ():
+        voter = HttpVoter(gateway = clients["gateway"], vt = clients["vt"])
+        for i in range(votes):
+            started = time.monotonic()
+            try:
+                token = voter.create_token()
+                voter.activate_token(token)
+                voter.insert_token(token)
+            except (VotingError, requests.RequestException):
+                outcomes["failed"] += 1
+            else:
+                try:
+                    voter.send_vote(ballot)
+                    outcomes["accepted"] += 1
+                except VotingError:
+                    outcomes["failed"] += 1
+                except requests.RequestException:
+                    # Vote may have been stored before link broke
+                    outcomes["unknown"] += 1
+            stop.wait(max(0, started + 1 / rate - time.monotonic()))
+
+    def synchronize_periodically ():
+        while not stop.wait(sync_interval):
+            try:
+                response = gateway_synchronize(clients["gateway"], retries = 0)
+                sync_calls["ok" if response.status_code == 200 else "failed"] += 1
+            except requests.RequestException:
+                sync_calls["failed"] += 1
+
+    voting_thread = threading.Thread(target = cast_votes, daemon = True)
+    sync_thread = threading.Thread(target = synchronize_periodically, daemon = True)
+    start = time.monotonic()
+    for thread in (script_thread, voting_thread, sync_thread):
+        thread.start()
+
+    voting_thread.join()
+    script_thread.join()
+
+    # Link is healthy again, synchronize until backlog is empty
+    recovered = time.monotonic()
+    drained = None
+    while time.monotonic() - recovered < timeout:
+        if gateway_statistics()["unsyncronized_count"] == 0:
+            drained = time.monotonic() - recovered
+            break
+        time.sleep(sync_interval)
+
+    stop.set()
+    sync_thread.join()
+    after = stack_counts()
+
+    stored = after["gateway_all"] - before["gateway_all"]
+    synchronized = after["gateway_synchronized"] - before["gateway_synchronized"]
+    on_server = after["server_total"] - before["server_total"]
+
+    return {
+        "votes": votes,
+        "outcomes": outcomes,
+        "sync_calls": sync_calls,
+        "voting_duration": recovered - start,
+        "drain_duration": drained,
+        "gateway_stored": stored,
+        "gateway_synchronized": synchronized,
+        "server_stored": on_server,
+        # Votes with unknown outcome may or may not be stored
+        "lost_in_gateway": max(0, outcomes["accepted"] - stored),
+        "unexpected_in_gateway": max(0, stored - outcomes["accepted"] - outcomes["unknown"]),
+        "lost_on_server": max(0, synchronized - on_server),
+        "duplicated_on_server": max(0, on_server - synchronized),
+        "proxies": {proxy.target_url: dict(proxy.stats) for proxy in proxies},
+    }
+
+
+def print_report (result):
+    outcomes = result["outcomes"]
+    print("Votes: %d accepted, %d failed, %d unknown of %d in %.1f s" % (outcomes["accepted"], outcomes["failed"], outcomes["unknown"], result["votes"], result["voting_duration"]))
+    print("Synchronize calls during faults: %d ok, %d failed" % (result["sync_calls"]["ok"], result["sync_calls"]["failed"]))
+    print("Backlog drained %s after link recovered" % ("%.2f s" % result["drain_duration"] if result["drain_duration"] is not None else "NOT"))
+    print("Gateway stored %d, synchronized %d, server stored %d" % (result["gateway_stored"], result["gateway_synchronized"], result["server_stored"]))
+    print("Lost in gateway %d, unexpected in gateway %d, lost on server %d, duplicated on server %d" % (result["lost_in_gateway"], result["unexpected_in_gateway"], result["lost_on_server"], result["duplicated_on_server"]))
+    for url, stats in result["proxies"].items():
+        print("  proxy %s connections: %d, bytes: %d, dropped: %d, refused: %d" % (url, stats["connections"], stats["bytes"], stats["dropped"], stats["refused"]))
+
+
+def add_fault_arguments (parser):
+    parser.add_argument("--latency", type = float, default = 0.0, help = "seconds per chunk and direction")
+    parser.add_argument("--jitter", type = float, default = 0.0)
+    parser.add_argument("--bandwidth", type = float, default = None, help = "bytes per second and direction")
+    parser.add_argument("--drop-rate", type = float, default = 0.0, help = "share of chunks that reset connection")
+    parser.add_argument("--seed", type = int, default = None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Degrade links to services and measure synchronization recovery")
+    commands = parser.add_subparsers(dest = "command")
+
+    serve_parser = commands.add_parser("serve", help = "proxy one service, e.g. for gateway to server link")
+    serve_parser.add_argument("--target", required = True, help = "URL of proxied service")
+    serve_parser.add_argument("--port", type = int, default = 0)
+    serve_parser.add_argument("--script", default = None, help = "JSON list of timed settings")
+    add_fault_arguments(serve_parser)
+
+    recovery_parser = commands.add_parser("recovery", help = "vote and synchronize through faulty link, measure recovery")
+    recovery_parser.add_argument("--proxy", choices = PROXIED_LINKS, action = "append", help = "links to degrade, default gateway, none when external serve proxy does the damage")
+    recovery_parser.add_argument("--server-port", type = int, default = 0, help = "port of server proxy, server URL of gateway must point to it")
+    recovery_parser.add_argument("--votes", type = int, default = 50)
+    recovery_parser.add_argument("--rate", type = float, default = 2.0, help = "votes per second")
+    recovery_parser.add_argument("--party", type = int, default = None)
+    recovery_parser.add_argument("--candidates", type = parse_candidates, default = [])
+    recovery_parser.add_argument("--sync-interval", type = float, default = 2.0)
+    recovery_parser.add_argument("--request-timeout", type = float, default = 5.0, help = "read timeout of proxied calls")
+    recovery_parser.add_argument("--outage-start", type = float, default = 5.0)
+    recovery_parser.add_argument("--outage-duration", type = float, default = 10.0)
+    recovery_parser.add_argument("--outage-mode", choices = OUTAGE_MODES, default = "reset")
+    recovery_parser.add_argument("--script", default = None, help = "JSON list of timed settings, replaces outage options")
+    recovery_parser.add_argument("--timeout", type = float, default = 300.0, help = "seconds to wait for backlog to drain")
+    add_fault_arguments(recovery_parser)
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.error("command is required")
+
+    settings = {"latency": args.latency, "jitter": args.jitter, "bandwidth": args.bandwidth, "drop_rate": args.drop_rate, "seed": args.seed}
+
+    if args.command == "serve":
+        proxy = FaultProxy(args.target, port = args.port, **settings).start()
+        print("%s -> %s" % (proxy.url(), args.target))
+        sys.stdout.flush()
+
+        try:
+            run_script([proxy], load_script(args.script) if args.script else [], threading.Event())
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            proxy.stop()
+        sys.exit()
+
+    links = args.proxy or ["gateway"]
+    if "none" in links and len(links) > 1:
+        parser.error("--proxy none cannot be combined with other links")
+    if "server" in links and not args.server_port:
+        parser.error("--server-port is required with --proxy server, gateway must be configured with it beforehand")
+
+    urls = {"gateway": GATEWAY_URL, "vt": VT_URL, "server": SERVER_URL}
+    ports = {"server": args.server_port}
+    proxies = {name: FaultProxy(urls[name], port = ports.get(name, 0), **settings).start() for name in links if name != "none"}
+    # Tester itself calls only gateway and VT, server is called by gateway
+    clients = {name: ServiceClient(name, proxies[name].url() if name in proxies else urls[name]) for name in ("gateway", "vt")}
+
+    if "server" in proxies:
+        print("%s -> %s, gateway must use it as server URL" % (proxies["server"].url(), SERVER_URL))
+
+    # Faults should surface as errors, not hang until default timeout
+    for client in clients.values():
+        client.timeout = (HTTP_CONNECT_TIMEOUT, args.request_timeout)
+
+    script = load_script(args.script) if args.script else outage_script(args.outage_start, args.outage_duration, args.outage_mode)
+
+    try:
+        result = measure_recovery(list(proxies.values()), clients, script, args.votes, args.rate, Ballot(args.party, args.candidates), args.sync_interval, args.timeout)
+    except StackApiError as e:
+        sys.exit(str(e))
+    finally:
+        for proxy in proxies.values():
+            proxy.stop()
+
+    print_report(result)
+
+    if "server" in proxies and not proxies["server"].stats["connections"]:
+        sys.exit("Gateway did not connect to server proxy %s, point its server URL to it" % proxies["server"].url())
+
+    if result["drain_duration"] is None or result["lost_in_gateway"] or result["unexpected_in_gateway"] or result["lost_on_server"] or result["duplicated_on_server"]:
+        sys.exit(1)
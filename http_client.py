@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import VT_URL, GATEWAY_URL, SERVER_URL, STATISTICS_URL
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3")) # seconds
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60")) # seconds
+HTTP_LONG_READ_TIMEOUT = float(os.getenv("HTTP_LONG_READ_TIMEOUT", "3600")) # seconds, bulk calls like seed, 0 waits without limit
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5")) # seconds
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class ConnectionCountingAdapter (HTTPAdapter):
+    def __init__ (self, *args, **kwargs):
+        self.connections = 0
+        self.connections_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager (self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": self.counting_pool_class(HTTPConnectionPool),
+            "https": self.counting_pool_class(HTTPSConnectionPool),
+        }
+
+    def counting_pool_class (self, pool_class):
+        adapter = self
+
+        # Counts every new TCP connection, including silent reconnects
+        class CountingConnection (pool_class.ConnectionCls):
+            def connect (self):
+                with adapter.connections_lock:
+                    adapter.connections += 1
+                return super().connect()
+
+        return type(pool_class.__name__, (pool_class,), {"ConnectionCls": CountingConnection})
+
+
+class ServiceClient:
+    def __init__ (self, name, base_url, pool_size = HTTP_POOL_SIZE, retries = HTTP_RETRIES):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.long_timeout = (HTTP_CONNECT_TIMEOUT, HTTP_LONG_READ_TIMEOUT or None)
+        self.max_retries = retries
+        self.requests = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+        # Keep-alive connections to one service, shared by all threads
+        self.adapter = ConnectionCountingAdapter(pool_connections = 1, pool_maxsize = pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+    def url (self, path):
+        return self.base_url + path
+
+    def request (self, method, path, idempotent = None, retries = None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if retries is None:
+            retries = self.max_retries
+
+        # Only calls without side effects are safe to repeat
+        attempts = 1 + (retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+
+            with self.lock:
+                self.requests += 1
+
+            try:
+                response = self.session.request(method, self.url(path), **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if last_attempt or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+
+            with self.lock:
+                self.retries += 1
+            time.sleep(HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+    def get (self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post (self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def stats (self):
+        return {
+            "requests": self.requests,
+            "connections": self.adapter.connections,
+            "reused": max(0, self.requests - self.adapter.connections),
+            "retries": self.retries,
+        }
+
+
+vt = ServiceClient("vt", VT_URL)
+gateway = ServiceClient("gateway", GATEWAY_URL)
+server = ServiceClient("server", SERVER_URL)
+statistics = ServiceClient("statistics", STATISTICS_URL)
+
+
+def connection_stats (clients = (vt, gateway, server, statistics)):
+    return {client.name: client.stats() for client in clients}
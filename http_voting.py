@@ -0,0 +1,113 @@
+import sys
+import time
+import argparse
+import threading
+
+import http_client
+from config import VT_VOTE_PATH
+
+MAX_CANDIDATES = 5
+
+
+class VotingError (Exception):
+    def __init__ (self, step, response):
+        super().__init__("%s failed with status %s: %s" % (step, response.status_code, response.text[:200]))
+        self.step = step
+        self.response = response
+
+
+class Ballot:
+    def __init__ (self, party_id = None, candidate_ids = ()):
+        candidate_ids = list(candidate_ids)
+
+        if candidate_ids and party_id is None:
+            raise ValueError("Candidates can not be selected without party")
+        if len(candidate_ids) > MAX_CANDIDATES:
+            raise ValueError("At most %d candidates can be selected" % MAX_CANDIDATES)
+
+        self.party_id = party_id
+        self.candidate_ids = candidate_ids
+
+    def payload (self):
+        # Same body as VT frontend sends after "Odoslať hlas"
+        return {"party_id": self.party_id, "candidate_ids": self.candidate_ids}
+
+
+class HttpVoter:
+    def __init__ (self, gateway = http_client.gateway, vt = http_client.vt, vt_lock = None):
+        self.gateway = gateway
+        self.vt = vt
+        # Voters sharing one VT must share its lock
+        self.vt_lock = vt_lock or threading.Lock()
+
+    def call (self, step, client, method, path, **kwargs):
+        response = client.request(method, path, **kwargs)
+        if response.status_code != 200:
+            raise VotingError(step, response)
+        return response
+
+    def create_token (self):
+        response = self.call("create_token", self.gateway, "POST", "token-manager-api/tokens/create")
+        return response.json()["token"]
+
+    def activate_token (self, token):
+        self.call("activate_token", self.gateway, "POST", "token-manager-api/tokens/writer/update", json = {"token": token})
+
+    def insert_token (self, token):
+        self.call("insert_token", self.vt, "POST", "backend/token", json = token)
+
+    def send_vote (self, ballot):
+        self.call("send_vote", self.vt, "POST", "backend/" + VT_VOTE_PATH, json = ballot.payload())
+
+    def cast_vote (self, ballot, token = None):
+        timings = {}
+
+        # Pre-provisioned token is already created and activated
+        if token is None:
+            start = time.perf_counter()
+            token = self.create_token()
+            timings["create_token"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.activate_token(token)
+            timings["activate_token"] = time.perf_counter() - start
+
+        # VT holds one inserted token, another vote must not replace it before send
+        start = time.perf_counter()
+        with self.vt_lock:
+            timings["vt_wait"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.insert_token(token)
+            timings["insert_token"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.send_vote(ballot)
+            timings["send_vote"] = time.perf_counter() - start
+
+        return timings
+
+
+def parse_candidates (value):
+    return [int(candidate_id) for candidate_id in value.split(",") if candidate_id]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Cast votes through VT backend without browser")
+    parser.add_argument("--votes", type = int, default = 1)
+    parser.add_argument("--party", type = int, default = None)
+    parser.add_argument("--candidates", type = parse_candidates, default = [])
+    args = parser.parse_args()
+
+    voter = HttpVoter()
+    ballot = Ballot(args.party, args.candidates)
+
+    start = time.perf_counter()
+    for i in range(args.votes):
+        try:
+            voter.cast_vote(ballot)
+        except VotingError as e:
+            sys.exit("Vote %d: %s" % (i + 1, e))
+    duration = time.perf_counter() - start
+
+    print("Cast %d votes in %.2f s (%.1f votes/s)" % (args.votes, duration, args.votes / duration))
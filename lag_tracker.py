@@ -0,0 +1,185 @@
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter
+
+import requests
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import WebDriverException
+
+from config import STATISTICS_URL
+from driver_pool import DriverPool
+from http_voting import Ballot, HttpVoter, parse_candidates
+from load_generator import run_load
+from metrics import summarize
+from selenium_helper import find_element, open_page
+from stack_api import StackApiError, gateway_statistics, gateway_synchronize, elastic_status, elastic_synchronize
+
+STAGES = ["gateway_synchronized", "server_total", "elastic_indexed", "statistics_visible"]
+STATISTICS_TOTAL_XPATH = "//div[contains(@class, 'elections-statistics')]//tr[th[text() = 'Počet hlasov spolu:']]/td"
+
+
+def statistics_total (driver):
+    open_page(driver, STATISTICS_URL)
+    return int(find_element(driver, STATISTICS_TOTAL_XPATH, by = By.XPATH).text)
+
+
+class LagTracker:
+    def __init__ (self, driver = None):
+        self.driver = driver
+        self.stages = STAGES if driver is not None else STAGES[:-1]
+        self.submitted = []
+        self.lags = {stage: [] for stage in self.stages}
+        self.totals = []
+        self.errors = Counter()
+        self.last_error = None
+        self.lock = threading.Lock()
+        self.baseline = self.read_counters()
+        self.reached = {stage: 0 for stage in self.stages}
+
+    def read_counters (self):
+        # Later stages are read first, votes can only move forward meanwhile
+        counters = {}
+        if self.driver is not None:
+            counters["statistics_visible"] = statistics_total(self.driver)
+
+        server_status = elastic_status()
+        counters["elastic_indexed"] = server_status["synchronized_votes"]
+        counters["server_total"] = server_status["total_votes"]
+
+        counters["gateway_synchronized"] = gateway_statistics()["syncronized_count"]
+
+        return counters
+
+    def vote_submitted (self):
+        with self.lock:
+            self.submitted.append(time.perf_counter())
+
+    def observe (self):
+        counters = self.read_counters()
+        now = time.perf_counter()
+
+        with self.lock:
+            submitted = list(self.submitted)
+
+        # Counters grow in order of votes, n-th new vote is visible once counter grew by n
+        previous = len(submitted)
+        for stage in self.stages:
+            # Vote cannot pass a stage before the previous one
+            visible = min(counters[stage] - self.baseline[stage], previous)
+            previous = max(self.reached[stage], visible)
+            for ordinal in range(self.reached[stage], visible):
+                self.lags[stage].append(now - submitted[ordinal])
+                if stage == self.stages[-1]:
+                    self.totals.append(now - submitted[ordinal])
+            self.reached[stage] = max(self.reached[stage], visible)
+
+    def poll (self):
+        # Failed read is retried on next poll and counted in report
+        try:
+            self.observe()
+        except (StackApiError, requests.RequestException, ValueError, KeyError, TypeError, WebDriverException) as e:
+            with self.lock:
+                self.errors[type(e).__name__] += 1
+                self.last_error = e
+
+    def all_visible (self):
+        return self.reached[self.stages[-1]] >= len(self.submitted)
+
+    def report (self):
+        report = {stage: summarize(lags) for stage, lags in self.lags.items()}
+        report["total"] = summarize(self.totals)
+        report["errors"] = dict(self.errors)
+        report["last_error"] = str(self.last_error) if self.last_error is not None else None
+        return report
+
+
+def run_synchronizer (stop, interval):
+    # Stand-in for periodic synchronization of the stack
+    while not stop.wait(interval):
+        gateway_synchronize()
+        elastic_synchronize()
+
+
+def run_observer (tracker, stop, interval):
+    while not stop.wait(interval):
+        tracker.poll()
+
+
+def track (tracker, cast_votes, poll_interval, sync_interval, timeout):
+    stop = threading.Event()
+    threads = [threading.Thread(target = run_observer, args = (tracker, stop, poll_interval), daemon = True)]
+    if sync_interval:
+        threads.append(threading.Thread(target = run_synchronizer, args = (stop, sync_interval), daemon = True))
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        cast_votes()
+
+        # Wait for the last votes to show up everywhere
+        deadline = time.monotonic() + timeout
+        while not tracker.all_visible() and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    tracker.poll()
+    return tracker.report()
+
+
+def print_report (report, submitted):
+    print("Votes submitted: %d" % submitted)
+    print("%-22s %8s %10s %10s %10s %10s" % ("stage", "visible", "median s", "p95 s", "p99 s", "max s"))
+    for stage, stats in report.items():
+        if stage in ("errors", "last_error"):
+            continue
+        if not stats["count"]:
+            print("%-22s %8d %10s %10s %10s %10s" % (stage, 0, "-", "-", "-", "-"))
+            continue
+        print("%-22s %8d %10.2f %10.2f %10.2f %10.2f" % (stage, stats["count"], stats["median"], stats["p95"], stats["p99"], stats["max"]))
+
+    for error, count in report["errors"].items():
+        print("  read errors %-20s %d" % (error, count))
+    if report["last_error"]:
+        print("  last read error: %s" % report["last_error"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure time from vote submission until it is visible in gateway, server, elastic and statistics")
+    parser.add_argument("--mode", choices = ["one-off", "sustained"], default = "one-off")
+    parser.add_argument("--terminals", type = int, default = 10)
+    parser.add_argument("--rate", type = float, default = 1.0, help = "votes per second in sustained mode")
+    parser.add_argument("--duration", type = float, default = 60.0, help = "seconds of sustained voting")
+    parser.add_argument("--party", type = int, default = None)
+    parser.add_argument("--candidates", type = parse_candidates, default = [])
+    parser.add_argument("--poll-interval", type = float, default = 0.5)
+    parser.add_argument("--sync-interval", type = float, default = 5.0, help = "0 relies on stack synchronizing on its own")
+    parser.add_argument("--timeout", type = float, default = 300.0, help = "seconds to wait for last vote")
+    parser.add_argument("--no-statistics", action = "store_true", help = "do not open statistics app in browser")
+    args = parser.parse_args()
+
+    ballot = Ballot(args.party, args.candidates)
+    driver_pool = None if args.no_statistics else DriverPool(size = 1)
+    driver = driver_pool.acquire() if driver_pool else None
+
+    try:
+        tracker = LagTracker(driver)
+
+        def cast_one_vote ():
+            HttpVoter().cast_vote(ballot)
+            tracker.vote_submitted()
+
+        def cast_sustained ():
+            asyncio.run(run_load(args.terminals, args.rate, args.duration, ballot, on_vote = tracker.vote_submitted))
+
+        report = track(tracker, cast_one_vote if args.mode == "one-off" else cast_sustained, args.poll_interval, args.sync_interval, args.timeout)
+        print_report(report, len(tracker.submitted))
+    finally:
+        if driver_pool:
+            driver_pool.release(driver)
+            driver_pool.close()
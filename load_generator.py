@@ -0,0 +1,175 @@
+import sys
+import time
+import queue
+import random
+import asyncio
+import argparse
+import threading
+import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from config import VT_URL, GATEWAY_URL
+from http_client import ServiceClient
+from http_voting import Ballot, HttpVoter, VotingError, parse_candidates
+from metrics import LatencyRecorder
+from results_store import save_run, prefixed
+from token_pool import TokenProvisioner, print_report as print_token_report, TOKEN_PRODUCERS, TOKEN_QUEUE_SIZE
+
+
+async def run_load (terminals, rate, duration, ballot, vt_urls = (VT_URL,), seed = None, on_vote = None, steady = False, recorder = None, tokens = None):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers = terminals)
+    arrivals = asyncio.Queue()
+    recorder = recorder or LatencyRecorder()
+    errors = Counter()
+    completed = 0
+
+    # Pools sized so that every terminal keeps its connection alive
+    gateway = ServiceClient("gateway", GATEWAY_URL, pool_size = terminals)
+    vts = [ServiceClient("vt", vt_url, pool_size = terminals) for vt_url in vt_urls]
+
+    # Each virtual terminal talks to its own VT if more are given, terminals sharing VT take turns
+    vt_locks = [threading.Lock() for vt in vts]
+    voters = [HttpVoter(gateway = gateway, vt = vts[i % len(vts)], vt_lock = vt_locks[i % len(vts)]) for i in range(terminals)]
+
+    async def generate_arrivals ():
+        rng = random.Random(seed)
+        end = loop.time() + duration
+        next_arrival = loop.time()
+
+        # Open loop, arrivals do not wait for terminals to finish
+        while True:
+            next_arrival += 1 / rate if steady else rng.expovariate(rate)
+            if next_arrival >= end:
+                break
+            await asyncio.sleep(max(0, next_arrival - loop.time()))
+            arrivals.put_nowait(time.perf_counter())
+
+        for i in range(terminals):
+            arrivals.put_nowait(None)
+
+    async def run_terminal (voter):
+        nonlocal completed
+
+        while True:
+            arrived = await arrivals.get()
+            if arrived is None:
+                return
+
+            # Pre-provisioned tokens take token manager off the voting path
+            token = None
+            if tokens is not None:
+                waiting = time.perf_counter()
+                try:
+                    token = await loop.run_in_executor(executor, tokens.get)
+                except queue.Empty:
+                    errors["token_wait"] += 1
+                    continue
+                recorder.record("token_wait", time.perf_counter() - waiting)
+
+            try:
+                timings = await loop.run_in_executor(executor, voter.cast_vote, ballot, token)
+            except VotingError as e:
+                errors[e.step] += 1
+                continue
+            except requests.RequestException as e:
+                errors[type(e).__name__] += 1
+                continue
+
+            for step, seconds in timings.items():
+                recorder.record(step, seconds)
+
+            # Includes time spent waiting for a free terminal
+            recorder.record("vote", time.perf_counter() - arrived)
+            completed += 1
+
+            if on_vote is not None:
+                on_vote()
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(generate_arrivals(), *[run_terminal(voter) for voter in voters])
+    finally:
+        executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "tokens": tokens.report() if tokens is not None else None,
+        "terminals": terminals,
+        "vts": len(vts),
+        "target_rate": rate,
+        "elapsed": elapsed,
+        "completed": completed,
+        "failed": sum(errors.values()),
+        "throughput": completed / elapsed if elapsed else 0,
+        "errors": dict(errors),
+        "latencies": recorder.summary(),
+        "connections": {"gateway": gateway.stats(), "vt": [vt.stats() for vt in vts]},
+    }
+
+
+def print_report (result):
+    attempted = result["completed"] + result["failed"]
+    error_rate = result["failed"] / attempted if attempted else 0
+
+    print("Terminals: %d, target rate: %.2f votes/s, elapsed: %.2f s" % (result["terminals"], result["target_rate"], result["elapsed"]))
+    if result["terminals"] > result["vts"]:
+        print("Terminals share %d VT, insert and send of votes on one VT are serialized (see vt_wait)" % result["vts"])
+    print("Completed: %d, failed: %d (%.2f %%), throughput: %.2f votes/s" % (result["completed"], result["failed"], error_rate * 100, result["throughput"]))
+
+    for step, count in result["errors"].items():
+        print("  errors %-16s %d" % (step, count))
+
+    print("%-16s %8s %10s %10s %10s %10s" % ("step", "count", "median ms", "p95 ms", "p99 ms", "max ms"))
+    for step, stats in result["latencies"].items():
+        print("%-16s %8d %10.1f %10.1f %10.1f %10.1f" % (step, stats["count"], stats["median"] * 1000, stats["p95"] * 1000, stats["p99"] * 1000, stats["max"] * 1000))
+
+    if result["tokens"] is not None:
+        print_token_report(result["tokens"])
+
+    for name, stats in [("gateway", result["connections"]["gateway"])] + [("vt", stats) for stats in result["connections"]["vt"]]:
+        print("%-16s requests: %d, connections: %d, reused: %d, retries: %d" % (name, stats["requests"], stats["connections"], stats["reused"], stats["retries"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Simulate polling station with concurrent voting terminals")
+    parser.add_argument("--terminals", type = int, default = 10)
+    parser.add_argument("--rate", type = float, default = 1.0, help = "mean arrival rate in votes per second (Poisson)")
+    parser.add_argument("--steady", action = "store_true", help = "evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--duration", type = float, default = 60.0, help = "seconds")
+    parser.add_argument("--party", type = int, default = None)
+    parser.add_argument("--candidates", type = parse_candidates, default = [])
+    parser.add_argument("--vt-url", action = "append", dest = "vt_urls")
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--pre-provision", action = "store_true", help = "create and activate tokens ahead of voting")
+    parser.add_argument("--producers", type = int, default = TOKEN_PRODUCERS)
+    parser.add_argument("--token-queue", type = int, default = TOKEN_QUEUE_SIZE)
+    args = parser.parse_args()
+
+    recorder = LatencyRecorder()
+    tokens = TokenProvisioner(producers = args.producers, queue_size = args.token_queue).start() if args.pre_provision else None
+    result = asyncio.run(run_load(
+        args.terminals,
+        args.rate,
+        args.duration,
+        Ballot(args.party, args.candidates),
+        vt_urls = args.vt_urls or [VT_URL],
+        seed = args.seed,
+        steady = args.steady,
+        recorder = recorder,
+        tokens = tokens,
+    ))
+
+    if tokens is not None:
+        tokens.stop()
+    print_report(result)
+
+    metrics = prefixed(recorder.samples, "load.")
+    metrics["load.throughput"] = [result["throughput"]]
+    if tokens is not None:
+        metrics.update(prefixed(tokens.recorder.samples, "token."))
+    save_run("load_generator", metrics)
+
+    if result["failed"]:
+        sys.exit(1)
@@ -0,0 +1,74 @@
+import math
+import threading
+
+
+def percentile (values, p):
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize (values):
+    return {
+        "count": len(values),
+        "min": min(values) if values else None,
+        "median": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+class LatencyRecorder:
+    def __init__ (self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record (self, name, seconds):
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def summary (self):
+        with self.lock:
+            return {name: summarize(values) for name, values in self.samples.items()}
+
+    def take (self):
+        # Hand over samples collected so far and start over
+        with self.lock:
+            samples, self.samples = self.samples, {}
+        return samples
+
+
+def mann_whitney_p (first, second):
+    # Two sided p-value of Mann-Whitney U test, normal approximation with tie correction
+    values = sorted([(value, 0) for value in first] + [(value, 1) for value in second])
+    n1, n2 = len(first), len(second)
+    if not n1 or not n2:
+        return None
+
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    index = 0
+    while index < len(values):
+        end = index
+        while end + 1 < len(values) and values[end + 1][0] == values[index][0]:
+            end += 1
+        for tied in range(index, end + 1):
+            ranks[tied] = (index + end) / 2 + 1
+        count = end - index + 1
+        ties += count ** 3 - count
+        index = end + 1
+
+    u = sum(rank for rank, (value, group) in zip(ranks, values) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0
+    if variance <= 0:
+        return 1.0
+
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
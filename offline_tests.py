@@ -0,0 +1,158 @@
+import os
+import asyncio
+import tempfile
+import unittest
+
+# Fake stack runs in this process, tester modules read its URLs when imported
+FAKE_STACK_PORT = int(os.getenv("FAKE_STACK_PORT", "9500"))
+for index, key in enumerate(["VT_URL", "GATEWAY_URL", "SERVER_URL", "STATISTICS_URL"]):
+    os.environ[key] = "http://127.0.0.1:%d/" % (FAKE_STACK_PORT + index)
+os.environ["SERVER_RESULTS_PATH"] = "results"
+os.environ["RESULTS_DB_PATH"] = ""
+os.environ["CATALOGUE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "catalogue.json")
+
+import http_client
+from fake_stack import FakeStack
+from admin_api import prepare_stack
+from metrics import percentile, mann_whitney_p
+from results_store import compare_metric
+from vote_ledger import VoteLedger, parse_results, synchronize_and_reconcile
+from lag_tracker import LagTracker
+from parallel_runner import shard
+from http_voting import Ballot, HttpVoter
+from load_generator import run_load
+from scenarios import load_catalogue, generate_ballots, cast_ballot_over_http
+from stack_api import gateway_statistics
+import sync_benchmark
+
+stack = None
+
+
+def setUpModule ():
+    global stack
+    stack = FakeStack(port = FAKE_STACK_PORT, latency = 0, item_latency = 0).start()
+
+
+def tearDownModule ():
+    stack.stop()
+
+
+class MetricsTest (unittest.TestCase):
+    def test_percentile (self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2.5)
+        self.assertEqual(percentile(range(1, 101), 100), 100)
+        self.assertAlmostEqual(percentile(range(1, 101), 95), 95.05)
+
+    def test_mann_whitney (self):
+        self.assertAlmostEqual(mann_whitney_p([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]), 0.0122, places = 4)
+        self.assertAlmostEqual(mann_whitney_p([1, 2, 3, 4, 5], [1, 2, 3, 4, 5]), 1.0)
+        self.assertIsNone(mann_whitney_p([], [1]))
+
+    def test_compare_metric (self):
+        baseline = [1.0, 1.1, 0.9, 1.0, 1.05, 0.95]
+        slower = [value * 2 for value in baseline]
+
+        self.assertTrue(compare_metric("step.vote", baseline, slower, 0.1, 0.05)["regression"])
+        self.assertTrue(compare_metric("step.vote", slower, baseline, 0.1, 0.05)["improvement"])
+        self.assertTrue(compare_metric("sync.throughput", slower, baseline, 0.1, 0.05)["regression"])
+        self.assertFalse(compare_metric("step.vote", baseline, [value * 1.05 for value in baseline], 0.1, 0.05)["regression"])
+
+        # Change within noise of samples is not significant
+        self.assertFalse(compare_metric("step.vote", [1, 5, 1, 5, 1, 5], [2, 4, 2, 6, 1, 6], 0.1, 0.05)["regression"])
+
+
+class ParsingTest (unittest.TestCase):
+    def test_parse_results (self):
+        data = {"data": {"parties": [
+            {"name": "KDH", "votes": 2, "candidates": [
+                {"degrees_before": None, "first_name": "Milan", "last_name": "Majerský", "votes": 1},
+                {"degrees_before": "Ing.", "first_name": "Anna", "last_name": "Záborská", "votes": 0},
+            ]},
+            {"name": "SaS", "votes": 0, "candidates": []},
+        ]}}
+
+        parties, candidates = parse_results(data)
+        self.assertEqual(dict(parties), {"KDH": 2})
+        self.assertEqual(dict(candidates), {"Milan Majerský": 1})
+        self.assertEqual(parse_results(data["data"]["parties"]), (parties, candidates))
+
+    def test_shard (self):
+        self.assertEqual(shard(list(range(5)), 2), [[0, 2, 4], [1, 3]])
+        self.assertEqual(shard(["a"], 3), [["a"], [], []])
+
+
+class ScriptedLagTracker (LagTracker):
+    def __init__ (self, readings):
+        self.readings = iter(readings)
+        super().__init__()
+
+    def read_counters (self):
+        return next(self.readings)
+
+
+class LagTrackerTest (unittest.TestCase):
+    def test_observe_caps_stages (self):
+        start = {"gateway_synchronized": 10, "server_total": 20, "elastic_indexed": 20}
+        # Server and elastic count votes from elsewhere, they cannot pass gateway
+        later = {"gateway_synchronized": 12, "server_total": 25, "elastic_indexed": 21}
+        tracker = ScriptedLagTracker([start, later])
+
+        for i in range(3):
+            tracker.vote_submitted()
+        tracker.observe()
+
+        self.assertEqual(tracker.reached, {"gateway_synchronized": 2, "server_total": 2, "elastic_indexed": 1})
+        self.assertEqual([len(tracker.lags[stage]) for stage in tracker.stages], [2, 2, 1])
+        self.assertEqual(len(tracker.totals), 1)
+        self.assertFalse(tracker.all_visible())
+
+
+class StackTest (unittest.TestCase):
+    def setUp (self):
+        stack.reset()
+        prepare_stack()
+
+    def test_load_generator (self):
+        result = asyncio.run(run_load(2, 50, 0.5, Ballot(), seed = 1))
+
+        self.assertEqual(result["failed"], 0)
+        self.assertGreater(result["completed"], 0)
+        self.assertEqual(gateway_statistics()["all_count"], result["completed"])
+
+    def test_scenarios (self):
+        ballots = generate_ballots(load_catalogue(refresh = True), 12, seed = 1)
+        ledger = VoteLedger.from_stack(reconcile_every = len(ballots))
+        voter = HttpVoter(gateway = http_client.gateway, vt = http_client.vt)
+
+        for ballot in ballots:
+            cast_ballot_over_http(voter, ledger, ballot)
+
+        self.assertEqual(synchronize_and_reconcile(ledger), [])
+
+        # Vote that never reached gateway is reported
+        ledger.record("missing", party = "KDH")
+        self.assertTrue(synchronize_and_reconcile(ledger))
+
+    def test_generate_ballots (self):
+        parties = load_catalogue(refresh = True)
+        ballots = generate_ballots(parties, 30, seed = 7)
+
+        self.assertEqual(ballots, generate_ballots(parties, 30, seed = 7))
+        self.assertEqual(len(ballots), 30)
+
+        # Edge cases first, empty ballot and largest party with 0, 1 and 5 candidates
+        self.assertIsNone(ballots[0].party)
+        self.assertEqual([len(ballot.candidates) for ballot in ballots[1:4]], [0, 1, 5])
+        self.assertEqual({ballot.party.name for ballot in ballots[1:4]}, {"SME RODINA"})
+        self.assertIsNotNone(generate_ballots(parties, 4, seed = 7, edge_cases = False, empty_share = 0)[0].party)
+
+    def test_sync_benchmark (self):
+        result = sync_benchmark.run_benchmark(20, Ballot())
+
+        self.assertEqual(result["synchronized"], 20)
+        self.assertEqual(result["after"]["unsyncronized_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
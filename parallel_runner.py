@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import LatencyRecorder
+from timing import write_report
+import browser_timing
+from results_store import save_run, prefixed
+from admin_api import ADMIN_SETUP_MODE
+from test_worker import test_ids, start_worker, read_result
+
+STACK_KEYS = ["VT_URL", "GATEWAY_URL", "SERVER_URL", "STATISTICS_URL"]
+# Every worker bootstraps its server and reconciles exact counts, so these must not be shared
+EXCLUSIVE_KEYS = ["GATEWAY_URL", "SERVER_URL"]
+TEST_MODULE = "tests"
+
+
+def load_stacks (path):
+    with open(path) as stacks_file:
+        stacks = json.load(stacks_file)
+
+    for index, stack in enumerate(stacks):
+        missing = [key for key in STACK_KEYS if key not in stack]
+        if missing:
+            raise SystemExit("Stack %d in %s misses %s" % (index, path, ", ".join(missing)))
+
+    for key in EXCLUSIVE_KEYS:
+        urls = [stack[key].rstrip("/") for stack in stacks]
+        shared = sorted(set(url for url in urls if urls.count(url) > 1))
+        if shared:
+            raise SystemExit("Stacks in %s share %s %s, every worker resets and reconciles its own stack" % (path, key, ", ".join(shared)))
+
+    if ADMIN_SETUP_MODE == "ui" and len(stacks) > 1:
+        # Admin UI test prepares the stack for tests after it, so it cannot be sharded
+        raise SystemExit("ADMIN_SETUP_MODE=ui prepares only one stack, run it with a single stack")
+
+    return stacks
+
+
+def shard (ids, workers):
+    # Round robin keeps every shard in original test order
+    return [ids[index::workers] for index in range(workers)]
+
+
+def run_worker (index, stack, ids, output_dir):
+    result_path = os.path.join(output_dir, "worker-%d.json" % index)
+
+    env = os.environ.copy()
+    env.update(stack)
+    env["TIMING_REPORT_PATH"] = os.path.join(output_dir, "worker-%d-timing.json" % index)
+    env["BROWSER_TIMING_REPORT_PATH"] = os.path.join(output_dir, "worker-%d-browser.json" % index)
+
+    # Merged run is stored once instead of every shard
+    env["RESULTS_DB_PATH"] = ""
+
+    process = start_worker(result_path, ids, env)
+    output = process.communicate()[0]
+    result = read_result(result_path, "worker-%d" % index, output)
+
+    result["worker"] = index
+    result["stack"] = stack
+    result["output"] = output
+    return result
+
+
+def run_parallel (stacks, ids, output_dir):
+    shards = [ids for ids in shard(ids, len(stacks)) if ids]
+
+    with ThreadPoolExecutor(max_workers = len(shards)) as executor:
+        futures = [executor.submit(run_worker, index, stacks[index], ids, output_dir) for index, ids in enumerate(shards)]
+        return [future.result() for future in futures]
+
+
+def merge_samples (results, key):
+    recorder = LatencyRecorder()
+    for result in results:
+        for name, samples in result[key].items():
+            for value in samples:
+                recorder.record(name, value)
+    return recorder
+
+
+def merge_results (results):
+    return {
+        "workers": len(results),
+        "run": sum(result["run"] for result in results),
+        "failures": [failure for result in results for failure in result["failures"]],
+        "errors": [error for result in results for error in result["errors"]],
+        "skipped": sum(len(result["skipped"]) for result in results),
+        "timing": merge_samples(results, "samples"),
+        "browser_timing": merge_samples(results, "browser_samples"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run tests sharded over workers, each bound to its own stack")
+    parser.add_argument("--stacks", default = os.getenv("STACKS_FILE", "stacks.json"), help = "JSON list of VT_URL, GATEWAY_URL, SERVER_URL, STATISTICS_URL sets")
+    parser.add_argument("--report", default = "parallel_timing_report.json")
+    parser.add_argument("--browser-report", default = "parallel_browser_timing_report.json")
+    parser.add_argument("ids", nargs = "*", help = "tests to run, default all of %s" % TEST_MODULE)
+    args = parser.parse_args()
+
+    stacks = load_stacks(args.stacks)
+    ids = args.ids or list(test_ids(unittest.defaultTestLoader.loadTestsFromName(TEST_MODULE)))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = run_parallel(stacks, ids, output_dir)
+
+    for result in results:
+        print("=== worker %d (%s)" % (result["worker"], result["stack"]["VT_URL"]))
+        print(result["output"])
+
+    merged = merge_results(results)
+    timing_summary = write_report(args.report, merged["timing"])
+    browser_summary = browser_timing.write_report(args.browser_report, merged["browser_timing"])
+    violations = browser_timing.check_budgets(browser_summary, browser_timing.load_budgets())
+    save_run("parallel_tests", dict(prefixed(merged["timing"].samples, "step."), **prefixed(merged["browser_timing"].samples, "browser.")))
+
+    print("Workers: %d, ran: %d, failures: %d, errors: %d, skipped: %d" % (merged["workers"], merged["run"], len(merged["failures"]), len(merged["errors"]), merged["skipped"]))
+    print("Timing report of all workers written to %s (%d steps)" % (args.report, len(timing_summary)))
+    print("Browser timing report of all workers written to %s (%d pages)" % (args.browser_report, len(browser_summary)))
+
+    for violation in violations:
+        print(violation)
+
+    if merged["failures"] or merged["errors"] or violations:
+        sys.exit(1)
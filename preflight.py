@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+import http_client
+from readiness import wait_until, NotReadyError
+
+load_dotenv()
+PREFLIGHT_TIMEOUT = float(os.getenv("PREFLIGHT_TIMEOUT", "60")) # seconds, whole stack
+PREFLIGHT_PROBE_TIMEOUT = float(os.getenv("PREFLIGHT_PROBE_TIMEOUT", "5")) # seconds, one request
+
+SERVICES = [
+    ("VT frontend", http_client.vt, "frontend/"),
+    ("GATEWAY voting service", http_client.gateway, "voting-service-api/"),
+    ("GATEWAY statevector", http_client.gateway, "statevector/config/config.json"),
+    ("GATEWAY voting process manager", http_client.gateway, "voting-process-manager-api/"),
+    ("SERVER", http_client.server, ""),
+    ("STATISTICS APP", http_client.statistics, ""),
+]
+
+
+def probe (name, client, path, timeout = PREFLIGHT_PROBE_TIMEOUT):
+    status = None
+    error = None
+    start = time.perf_counter()
+
+    try:
+        status = client.get(path, retries = 0, timeout = timeout).status_code
+    except requests.RequestException as e:
+        error = type(e).__name__
+
+    return {
+        "name": name,
+        "url": client.url(path),
+        "status": status,
+        "error": error,
+        "latency": time.perf_counter() - start,
+        "available": status == 200,
+    }
+
+
+def check_services (services = SERVICES, timeout = PREFLIGHT_PROBE_TIMEOUT):
+    with ThreadPoolExecutor(max_workers = len(services)) as executor:
+        futures = [executor.submit(probe, name, client, path, timeout) for name, client, path in services]
+        return {future.result()["name"]: future.result() for future in futures}
+
+
+def wait_for_stack (services = SERVICES, timeout = PREFLIGHT_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    results = {}
+
+    def stack_healthy ():
+        # Available services are not probed again
+        pending = [service for service in services if not results.get(service[0], {}).get("available")]
+        probe_timeout = max(0.1, min(PREFLIGHT_PROBE_TIMEOUT, deadline - time.monotonic()))
+        results.update(check_services(pending, probe_timeout))
+        return all(result["available"] for result in results.values())
+
+    try:
+        wait_until(stack_healthy, "Stack", timeout = timeout)
+    except NotReadyError:
+        pass
+
+    return results
+
+
+def print_matrix (results, file = sys.stdout):
+    print("%-32s %-16s %10s  %s" % ("service", "status", "latency", "url"), file = file)
+    for result in results.values():
+        status = "OK" if result["available"] else (result["error"] or str(result["status"]))
+        print("%-32s %-16s %8.0fms  %s" % (result["name"], status, result["latency"] * 1000, result["url"]), file = file)
+
+
+def unavailable_services (results):
+    return [name for name, result in results.items() if not result["available"]]
+
+
+if __name__ == "__main__":
+    results = wait_for_stack()
+    print_matrix(results)
+
+    if unavailable_services(results):
+        sys.exit("Not available: %s" % ", ".join(unavailable_services(results)))
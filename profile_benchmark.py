@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import unittest
+import threading
+
+from browser_profiles import PROFILES, BROWSER_PROFILE, BROWSER_PROFILE_DIR, load_profile
+from driver_pool import DriverPool, DRIVER_POOL_SIZE
+from results_store import save_run
+from test_worker import test_ids, start_worker, read_result
+
+
+def process_tree_memory (pid):
+    # Proportional set size of process and its descendants, shared pages counted once
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open("/proc/%s/stat" % entry) as stat:
+                parent = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending += children.get(current, [])
+        total += process_memory_kb(current)
+
+    return total / 1024
+
+
+def process_memory_kb (pid):
+    for path, field in (("/proc/%d/smaps_rollup" % pid, "Pss:"), ("/proc/%d/status" % pid, "VmRSS:")):
+        try:
+            with open(path) as memory:
+                for line in memory:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except OSError:
+            continue
+    return 0
+
+
+def measure_profile (name, ids, output_dir, sample_interval = 0.2):
+    result_path = os.path.join(output_dir, "%s.json" % name)
+    env = os.environ.copy()
+    env["BROWSER_PROFILE"] = name
+    env["RESULTS_DB_PATH"] = ""
+
+    start = time.perf_counter()
+    process = start_worker(result_path, ids, env)
+
+    peak_memory = 0.0
+    stop = threading.Event()
+
+    def sample_memory ():
+        nonlocal peak_memory
+        while not stop.wait(sample_interval):
+            peak_memory = max(peak_memory, process_tree_memory(process.pid))
+
+    sampler = threading.Thread(target = sample_memory, daemon = True)
+    sampler.start()
+    output = process.communicate()[0]
+    stop.set()
+    sampler.join()
+    wall_time = time.perf_counter() - start
+
+    result = read_result(result_path, name, output)
+    result.update({"profile": name, "failed": len(result["failures"]) + len(result["errors"]), "wall_time": wall_time, "peak_memory_mb": peak_memory, "output": output})
+    return result
+
+
+def build_profiles (names, slots):
+    # Started once, browser fills profile with caches and settles its first run
+    for name in names:
+        pool = DriverPool(profile = load_profile(name), size = slots)
+        pool.start()
+        pool.close()
+        print("Profile %s built in %s" % (name, os.path.join(BROWSER_PROFILE_DIR, name)))
+
+
+def print_report (results):
+    tests = sorted({test for result in results for test in result["durations"]})
+
+    print(("%-52s" + " %16s" * len(results)) % tuple(["test"] + [result["profile"] for result in results]))
+    for test in tests:
+        print(("%-52s" + " %16s" * len(results)) % tuple([test[-52:]] + ["%.2f s" % result["durations"][test] if test in result["durations"] else "-" for result in results]))
+    print(("%-52s" + " %16s" * len(results)) % tuple(["wall time"] + ["%.2f s" % result["wall_time"] for result in results]))
+    print(("%-52s" + " %16s" * len(results)) % tuple(["peak memory"] + ["%.0f MB" % result["peak_memory_mb"] for result in results]))
+    print(("%-52s" + " %16s" * len(results)) % tuple(["failures"] + [str(result["failed"]) for result in results]))
+
+    passing = [result for result in results if not result["failed"]]
+    if passing:
+        print("Fastest passing profile: %s" % min(passing, key = lambda result: result["wall_time"])["profile"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build reusable browser profile directories or compare profiles on UI tests")
+    commands = parser.add_subparsers(dest = "command")
+
+    build_parser = commands.add_parser("build", help = "create profile directories in BROWSER_PROFILE_DIR")
+    build_parser.add_argument("--profile", action = "append", choices = list(PROFILES))
+    build_parser.add_argument("--slots", type = int, default = DRIVER_POOL_SIZE)
+
+    benchmark_parser = commands.add_parser("benchmark", help = "run tests with every profile, measure wall time and memory")
+    benchmark_parser.add_argument("--profile", action = "append", choices = list(PROFILES))
+    benchmark_parser.add_argument("--verbose", action = "store_true", help = "print output of test runs")
+    benchmark_parser.add_argument("ids", nargs = "*", help = "tests to run, default all of tests")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if not BROWSER_PROFILE_DIR:
+            raise SystemExit("BROWSER_PROFILE_DIR is not set")
+        build_profiles(args.profile or [BROWSER_PROFILE], args.slots)
+
+    elif args.command == "benchmark":
+        ids = args.ids or list(test_ids(unittest.defaultTestLoader.loadTestsFromName("tests")))
+        with tempfile.TemporaryDirectory() as output_dir:
+            results = [measure_profile(name, ids, output_dir) for name in args.profile or list(PROFILES)]
+
+        if args.verbose:
+            for result in results:
+                print("=== %s" % result["profile"])
+                print(result["output"])
+
+        print_report(results)
+
+        metrics = {}
+        for result in results:
+            metrics["profile.%s.wall_time" % result["profile"]] = [result["wall_time"]]
+            metrics["profile.%s.peak_memory_mb" % result["profile"]] = [result["peak_memory_mb"]]
+            for test, seconds in result["durations"].items():
+                metrics["profile.%s.%s" % (result["profile"], test)] = [seconds]
+        save_run("browser_profiles", metrics)
+
+        if any(result["failed"] for result in results):
+            sys.exit(1)
+
+    else:
+        parser.print_help()
@@ -0,0 +1,75 @@
+import os
+import time
+import logging
+import requests
+from dotenv import load_dotenv
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import WebDriverException
+
+import http_client
+from config import VT_FRONTEND_URL
+from selenium_helper import find_element, open_page
+
+load_dotenv()
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "60")) # seconds
+READY_INITIAL_DELAY = 0.1 # seconds
+READY_MAX_DELAY = 2.0 # seconds
+
+logger = logging.getLogger("readiness")
+
+
+class NotReadyError (Exception):
+    pass
+
+
+def wait_until (condition, description, timeout = READY_TIMEOUT, initial_delay = READY_INITIAL_DELAY, max_delay = READY_MAX_DELAY):
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = initial_delay
+    checks = 0
+    last_error = None
+
+    while True:
+        checks += 1
+
+        try:
+            result = condition()
+        except (requests.RequestException, WebDriverException) as e:
+            result = None
+            last_error = e
+
+        if result:
+            logger.info("%s ready after %.2f s (%d checks)", description, time.monotonic() - start, checks)
+            return result
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            message = "%s not ready after %.1f s (%d checks)" % (description, timeout, checks)
+            if last_error is not None:
+                message += ", last error: %s" % last_error
+            raise NotReadyError(message)
+
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+
+
+def gateway_config_ready ():
+    return http_client.gateway.get("statevector/config/config.json", retries = 0).status_code == 200
+
+
+def vt_backend_ready ():
+    # Proxy answers 5xx until backend is up
+    return http_client.vt.get("backend/", retries = 0).status_code < 500
+
+
+def vt_frontend_ready (driver):
+    # Timeout of rendering counts as not ready, page is reloaded on next check
+    open_page(driver, VT_FRONTEND_URL)
+    return find_element(driver, "//div[text()='Načítajte NFC tag']", by = By.XPATH)
+
+
+def element_state (driver, element_id, states):
+    # Loading placeholder or text before update is not one of final states
+    text = driver.find_element(By.ID, element_id).text.strip()
+    return text if text in states else None
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import platform
+import subprocess
+from dotenv import load_dotenv
+
+import requests
+
+import http_client
+from metrics import percentile, mann_whitney_p
+
+load_dotenv()
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", "results.db") # empty disables storing
+STACK_VERSIONS = os.getenv("STACK_VERSIONS", "") # e.g. "gateway=1.4.0,server=2.1.0", overrides versions read from stack
+
+# OpenAPI documents of services carry their version
+SERVICE_VERSION_PATHS = [
+    ("vt", http_client.vt, "backend/openapi.json"),
+    ("gateway", http_client.gateway, "voting-service-api/openapi.json"),
+    ("server", http_client.server, "openapi.json"),
+]
+
+# Metrics with these endings get better when they grow
+HIGHER_IS_BETTER = ("throughput",)
+MIN_SAMPLES = 5
+
+SCHEMA = """
+create table if not exists runs (
+    id integer primary key autoincrement,
+    tool text not null,
+    label text,
+    created real not null,
+    host text,
+    platform text,
+    python text,
+    cpus integer,
+    tester_commit text,
+    versions text
+);
+create table if not exists metrics (
+    run_id integer not null references runs (id),
+    name text not null,
+    samples text not null,
+    primary key (run_id, name)
+);
+"""
+
+
+def prefixed (samples, prefix):
+    return {prefix + name: values for name, values in samples.items()}
+
+
+def connect (path = RESULTS_DB_PATH):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def service_versions ():
+    versions = {}
+
+    for service, client, path in SERVICE_VERSION_PATHS:
+        try:
+            response = client.get(path, retries = 0)
+            versions[service] = response.json()["info"]["version"] if response.status_code == 200 else "unknown"
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            versions[service] = "unknown"
+
+    for item in STACK_VERSIONS.split(","):
+        if "=" in item:
+            service, version = item.split("=", 1)
+            versions[service.strip()] = version.strip()
+
+    return versions
+
+
+def tester_commit ():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = os.path.dirname(os.path.abspath(__file__)), stdout = subprocess.PIPE, stderr = subprocess.DEVNULL, universal_newlines = True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def save_run (tool, metrics, label = None, path = RESULTS_DB_PATH):
+    # Metrics are lists of samples by name, one value for single measurements
+    if not path:
+        return None
+
+    connection = connect(path)
+    with connection:
+        cursor = connection.execute(
+            "insert into runs (tool, label, created, host, platform, python, cpus, tester_commit, versions) values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (tool, label, time.time(), socket.gethostname(), platform.platform(), platform.python_version(), os.cpu_count(), tester_commit(), json.dumps(service_versions(), sort_keys = True)),
+        )
+        run_id = cursor.lastrowid
+        connection.executemany(
+            "insert into metrics (run_id, name, samples) values (?, ?, ?)",
+            [(run_id, name, json.dumps(samples)) for name, samples in metrics.items() if samples],
+        )
+    connection.close()
+    return run_id
+
+
+def load_run (connection, run_id):
+    row = connection.execute("select id, tool, label, created, host, platform, python, cpus, tester_commit, versions from runs where id = ?", (run_id,)).fetchone()
+    if row is None:
+        raise SystemExit("Run %s not found" % run_id)
+
+    run = dict(zip(["id", "tool", "label", "created", "host", "platform", "python", "cpus", "tester_commit", "versions"], row))
+    run["versions"] = json.loads(run["versions"] or "{}")
+    run["metrics"] = {name: json.loads(samples) for name, samples in connection.execute("select name, samples from metrics where run_id = ?", (run_id,))}
+    return run
+
+
+def latest_run_id (connection, tool = None, label = None, exclude = None):
+    query = "select id from runs where 1 = 1"
+    parameters = []
+    for column, value in (("tool", tool), ("label", label)):
+        if value is not None:
+            query += " and %s = ?" % column
+            parameters.append(value)
+    if exclude is not None:
+        query += " and id != ?"
+        parameters.append(exclude)
+
+    row = connection.execute(query + " order by id desc limit 1", parameters).fetchone()
+    return row[0] if row else None
+
+
+def compare_metric (name, baseline, current, tolerance, alpha):
+    baseline_median = percentile(baseline, 50)
+    current_median = percentile(current, 50)
+    change = (current_median - baseline_median) / baseline_median if baseline_median else 0
+
+    # Share of change in the bad direction
+    worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+
+    # Few samples cannot be tested, e.g. one throughput per run
+    p_value = mann_whitney_p(baseline, current) if len(baseline) >= MIN_SAMPLES and len(current) >= MIN_SAMPLES else None
+    significant = p_value is None or p_value < alpha
+
+    return {
+        "name": name,
+        "baseline": baseline_median,
+        "current": current_median,
+        "change": change,
+        "p_value": p_value,
+        "regression": worse > tolerance and significant,
+        "improvement": -worse > tolerance and significant,
+    }
+
+
+def compare_runs (baseline, current, tolerance, alpha, prefix = ""):
+    names = sorted(name for name in current["metrics"] if name in baseline["metrics"] and name.startswith(prefix))
+    return [compare_metric(name, baseline["metrics"][name], current["metrics"][name], tolerance, alpha) for name in names]
+
+
+def print_comparison (baseline, current, comparisons):
+    for title, run in (("baseline", baseline), ("current", current)):
+        print("%-8s run %d %s on %s (%s), versions %s" % (
+            title,
+            run["id"],
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(run["created"])),
+            run["host"],
+            run["platform"],
+            ", ".join("%s %s" % item for item in sorted(run["versions"].items())) or "-",
+        ))
+
+    if (baseline["host"], baseline["platform"], baseline["cpus"]) != (current["host"], current["platform"], current["cpus"]):
+        print("warning: runs come from different hosts")
+
+    print("%-48s %12s %12s %9s %8s" % ("metric", "baseline", "current", "change", "p"))
+    for comparison in comparisons:
+        print("%-48s %12.4g %12.4g %+8.1f%% %8s %s" % (
+            comparison["name"],
+            comparison["baseline"],
+            comparison["current"],
+            comparison["change"] * 100,
+            "%.3f" % comparison["p_value"] if comparison["p_value"] is not None else "-",
+            "REGRESSION" if comparison["regression"] else "improved" if comparison["improvement"] else "",
+        ))
+
+
+def list_runs (connection, tool = None, limit = 20):
+    query = "select id, tool, label, created, host, versions, (select count(*) from metrics where run_id = runs.id) from runs"
+    parameters = []
+    if tool is not None:
+        query += " where tool = ?"
+        parameters.append(tool)
+
+    print("%6s %-16s %-12s %-17s %-20s %8s %s" % ("id", "tool", "label", "created", "host", "metrics", "versions"))
+    for run_id, tool, label, created, host, versions, count in connection.execute(query + " order by id desc limit ?", parameters + [limit]):
+        versions = json.loads(versions or "{}")
+        print("%6d %-16s %-12s %-17s %-20s %8d %s" % (run_id, tool, label or "", time.strftime("%Y-%m-%d %H:%M", time.localtime(created)), host, count, ", ".join("%s %s" % item for item in sorted(versions.items()))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Stored results of tester runs and comparison with baseline")
+    parser.add_argument("--db", default = RESULTS_DB_PATH)
+    commands = parser.add_subparsers(dest = "command")
+
+    list_parser = commands.add_parser("list", help = "show stored runs")
+    list_parser.add_argument("--tool", default = None)
+    list_parser.add_argument("--limit", type = int, default = 20)
+
+    label_parser = commands.add_parser("label", help = "label run, e.g. as baseline")
+    label_parser.add_argument("run", type = int)
+    label_parser.add_argument("label")
+
+    compare_parser = commands.add_parser("compare", help = "compare run with baseline, exit 1 on regression")
+    compare_parser.add_argument("--run", type = int, default = None, help = "default latest run")
+    compare_parser.add_argument("--baseline", type = int, default = None, help = "default latest run of same tool labelled --baseline-label")
+    compare_parser.add_argument("--baseline-label", default = "baseline")
+    compare_parser.add_argument("--tolerance", type = float, default = 0.1, help = "share of change of median allowed")
+    compare_parser.add_argument("--alpha", type = float, default = 0.05, help = "significance level of Mann-Whitney U test")
+    compare_parser.add_argument("--metric", default = "", help = "compare only metrics starting with this prefix")
+
+    args = parser.parse_args()
+    if not args.db:
+        raise SystemExit("RESULTS_DB_PATH is empty")
+    connection = connect(args.db)
+
+    if args.command == "label":
+        with connection:
+            if not connection.execute("update runs set label = ? where id = ?", (args.label, args.run)).rowcount:
+                raise SystemExit("Run %s not found" % args.run)
+
+    elif args.command == "compare":
+        current = load_run(connection, args.run or latest_run_id(connection))
+        baseline_id = args.baseline or latest_run_id(connection, current["tool"], args.baseline_label, exclude = current["id"])
+        if baseline_id is None:
+            raise SystemExit("No %s run labelled %s" % (current["tool"], args.baseline_label))
+        baseline = load_run(connection, baseline_id)
+
+        comparisons = compare_runs(baseline, current, args.tolerance, args.alpha, args.metric)
+        print_comparison(baseline, current, comparisons)
+
+        if any(comparison["regression"] for comparison in comparisons):
+            sys.exit(1)
+
+    else:
+        list_runs(connection, getattr(args, "tool", None), getattr(args, "limit", 20))
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import random
+import argparse
+from collections import namedtuple
+from dotenv import load_dotenv
+
+import http_client
+from http_voting import Ballot, HttpVoter, MAX_CANDIDATES
+from driver_pool import DriverPool
+from vote_ledger import VoteLedger, candidate_name, synchronize_and_reconcile
+from vt_pages import PartyPage, CandidatePage, SummaryPage
+
+load_dotenv()
+CATALOGUE_CACHE_PATH = os.getenv("CATALOGUE_CACHE_PATH", ".catalogue_cache.json")
+
+Party = namedtuple("Party", ["id", "name", "candidates"])
+Candidate = namedtuple("Candidate", ["id", "vt_name", "statistics_name"])
+ScenarioBallot = namedtuple("ScenarioBallot", ["party", "candidates"])
+
+
+def fetch_catalogue ():
+    response = http_client.gateway.get("statevector/config/config.json")
+    if response.status_code != 200:
+        raise SystemExit("GATEWAY config failed with status %s" % response.status_code)
+    return response.json()
+
+
+def load_catalogue (refresh = False):
+    config = None
+
+    if not refresh:
+        try:
+            with open(CATALOGUE_CACHE_PATH) as cache_file:
+                config = json.load(cache_file)
+        except (OSError, ValueError):
+            config = None
+
+    if config is None:
+        config = fetch_catalogue()
+        try:
+            with open(CATALOGUE_CACHE_PATH, "w") as cache_file:
+                json.dump(config, cache_file)
+        except OSError:
+            pass
+
+    parties = []
+    for party in config["parties"]:
+        candidates = []
+        for candidate in party["candidates"]:
+            vt_name = "%s %s" % (candidate["first_name"], candidate["last_name"])
+            candidates.append(Candidate(candidate["_id"], vt_name, candidate_name(candidate)))
+        parties.append(Party(party["_id"], party["name"], candidates))
+
+    return parties
+
+
+def parse_weights (value):
+    weights = {}
+    for item in value.split(","):
+        if item:
+            name, weight = item.rsplit("=", 1)
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+def random_ballot (rng, parties, party_weights, empty_share):
+    if rng.random() < empty_share:
+        return ScenarioBallot(None, [])
+
+    party = rng.choices(parties, weights = [party_weights.get(party.name, 1.0) for party in parties])[0]
+    count = rng.randint(0, min(MAX_CANDIDATES, len(party.candidates)))
+
+    # Keep list order, browser flow pages through candidates only forward
+    picked = sorted(rng.sample(range(len(party.candidates)), count))
+    return ScenarioBallot(party, [party.candidates[index] for index in picked])
+
+
+def edge_case_ballots (parties):
+    ballots = [ScenarioBallot(None, [])]
+
+    largest = max(parties, key = lambda party: len(party.candidates))
+    for count in (0, 1, MAX_CANDIDATES):
+        if count <= len(largest.candidates):
+            ballots.append(ScenarioBallot(largest, largest.candidates[:count]))
+
+    return ballots
+
+
+def generate_ballots (parties, count, seed = None, party_weights = None, empty_share = 0.05, edge_cases = True):
+    rng = random.Random(seed)
+    ballots = edge_case_ballots(parties)[:count] if edge_cases else []
+
+    while len(ballots) < count:
+        ballots.append(random_ballot(rng, parties, party_weights or {}, empty_share))
+
+    return ballots
+
+
+def http_ballot (ballot):
+    if ballot.party is None:
+        return Ballot()
+    return Ballot(ballot.party.id, [candidate.id for candidate in ballot.candidates])
+
+
+def record_ballot (ledger, token, ballot, terminal = "vt"):
+    party = ballot.party.name if ballot.party else None
+    return ledger.record(token, party = party, candidates = [candidate.statistics_name for candidate in ballot.candidates], terminal = terminal)
+
+
+def cast_ballot_over_http (voter, ledger, ballot):
+    token = voter.create_token()
+    voter.activate_token(token)
+    voter.insert_token(token)
+    voter.send_vote(http_ballot(ballot))
+    record_ballot(ledger, token, ballot)
+
+
+def cast_ballot_in_browser (driver, voter, ledger, ballot):
+    token = voter.create_token()
+    voter.activate_token(token)
+    voter.insert_token(token)
+
+    party_page = PartyPage(driver)
+    party_page.open()
+
+    if ballot.party is None:
+        party_page.confirm()
+        party_page.click(PartyPage.SEND_EMPTY)
+    else:
+        party_page.select_party_by_name(ballot.party.name)
+        party_page.confirm()
+        party_page.find(PartyPage.MODAL)
+        party_page.confirm_party()
+
+        candidate_page = CandidatePage(driver)
+        candidate_page.wait_for_candidates()
+        for candidate in ballot.candidates:
+            candidate_page.select_candidate_by_name(candidate.vt_name)
+
+        # Both empty and filled candidate selection ends in confirmation dialog
+        candidate_page.confirm()
+        candidate_page.continue_to_summary()
+
+    SummaryPage(driver).send_vote()
+    record_ballot(ledger, token, ballot)
+
+
+def expected_results (ledger):
+    return {
+        "total": len(ledger.votes),
+        "parties": dict(ledger.party_tally()),
+        "candidates": dict(ledger.candidate_tally()),
+        "regional_winner": ledger.regional_winner(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Cast generated ballots over HTTP and check aggregate results")
+    parser.add_argument("--count", type = int, default = 100)
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--weights", type = parse_weights, default = {}, help = "party weights, e.g. \"SME RODINA=3,KDH=1\"")
+    parser.add_argument("--empty-share", type = float, default = 0.05, help = "share of ballots without party")
+    parser.add_argument("--no-edge-cases", action = "store_true")
+    parser.add_argument("--refresh-catalogue", action = "store_true")
+    parser.add_argument("--expected", default = None, help = "write expected results to JSON file")
+    parser.add_argument("--no-browser", action = "store_true", help = "skip check of statistics app")
+    args = parser.parse_args()
+
+    parties = load_catalogue(args.refresh_catalogue)
+    ballots = generate_ballots(parties, args.count, args.seed, args.weights, args.empty_share, not args.no_edge_cases)
+
+    ledger = VoteLedger.from_stack(reconcile_every = len(ballots))
+
+    voter = HttpVoter()
+    for ballot in ballots:
+        cast_ballot_over_http(voter, ledger, ballot)
+
+    results = expected_results(ledger)
+    print(json.dumps(results, indent = 2, ensure_ascii = False))
+
+    if args.expected:
+        with open(args.expected, "w") as expected_file:
+            json.dump(results, expected_file, indent = 2, ensure_ascii = False)
+
+    # Statistics app is checked in browser, server results over HTTP
+    driver_pool = None if args.no_browser else DriverPool(size = 1)
+    driver = driver_pool.acquire() if driver_pool else None
+    try:
+        differences = synchronize_and_reconcile(ledger, driver)
+    finally:
+        if driver_pool:
+            driver_pool.release(driver)
+            driver_pool.close()
+
+    for difference in differences:
+        print(difference, file = sys.stderr)
+
+    if differences:
+        sys.exit(1)
@@ -1,26 +1,212 @@
 import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import weakref
+import threading
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import WebDriverException
+
+from metrics import percentile
+from timing import step
 
 load_dotenv()
-PAGE_LOAD_DELAY = os.getenv("PAGE_LOAD_DELAY") # seconds
-PAGE_LONG_LOAD_DELAY = os.getenv("PAGE_LONG_LOAD_DELAY") # seconds
+PAGE_LOAD_DELAY = float(os.getenv("PAGE_LOAD_DELAY", "3")) # seconds
+PAGE_LONG_LOAD_DELAY = float(os.getenv("PAGE_LONG_LOAD_DELAY", "6")) # seconds
+
+# Timeouts learned from previous waits for the same locator
+ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "1") == "1"
+WAIT_HISTORY_PATH = os.getenv("WAIT_HISTORY_PATH", ".wait_history.json")
+WAIT_HISTORY_SIZE = int(os.getenv("WAIT_HISTORY_SIZE", "200")) # samples per locator
+WAIT_HISTORY_RUNS = int(os.getenv("WAIT_HISTORY_RUNS", "50")) # saved runs locator is kept without waits
+WAIT_MIN_SAMPLES = int(os.getenv("WAIT_MIN_SAMPLES", "10"))
+WAIT_TIMEOUT_PERCENTILE = float(os.getenv("WAIT_TIMEOUT_PERCENTILE", "99"))
+WAIT_TIMEOUT_FACTOR = float(os.getenv("WAIT_TIMEOUT_FACTOR", "1.5"))
+WAIT_TIMEOUT_MARGIN = float(os.getenv("WAIT_TIMEOUT_MARGIN", "1")) # seconds
+WAIT_TIMEOUT_FLOOR = float(os.getenv("WAIT_TIMEOUT_FLOOR", "1")) # seconds
+WAIT_TIMEOUT_CEILING = float(os.getenv("WAIT_TIMEOUT_CEILING", "30")) # seconds
+WAIT_NEAR_BUDGET = float(os.getenv("WAIT_NEAR_BUDGET", "0.8")) # share of timeout
+
+logger = logging.getLogger("waits")
+
+_wait_history_lock = threading.Lock()
+_wait_history = None
+_new_waits = {}
+near_budget_waits = []
+
+# Origins opened by each browser, pool clears cookies and storage only of these
+_visited_origins_lock = threading.Lock()
+_visited_origins = weakref.WeakKeyDictionary()
+
+# Checks all texts in one round-trip instead of transferring whole page source
+MISSING_TEXTS_SCRIPT = """
+var text = (arguments[1] || document.documentElement).textContent;
+return arguments[0].filter(function (expected) { return text.indexOf(expected) === -1; });
+"""
+
+# Marker of old document, gone once browser replaced it with the new one
+LEAVING_SCRIPT = "window.testerLeavingPage = true;"
+NEW_DOCUMENT_SCRIPT = "return !window.testerLeavingPage && document.readyState !== 'loading';"
+
+def missing_texts (driver, texts, scope = None):
+    return driver.execute_script(MISSING_TEXTS_SCRIPT, [str(text) for text in texts], scope)
 
 def is_text_present (driver, text):
-    return str(text) in driver.page_source
+    return not missing_texts(driver, [text])
 
 def click_on (driver, element):
     driver.execute_script("arguments[0].click();", element)
 
-def find_element (driver, identifier, by = By.CLASS_NAME, longDelay = False):
+def read_wait_history ():
+    try:
+        with open(WAIT_HISTORY_PATH) as history_file:
+            history = json.load(history_file)
+    except (OSError, ValueError):
+        history = {}
+
+    # History without run counters has run specific keys, it starts over
+    if "waits" not in history:
+        return {"runs": 0, "waits": {}}
+    return history
+
+def wait_history ():
+    global _wait_history
+
+    if _wait_history is None:
+        _wait_history = {key: entry["samples"] for key, entry in read_wait_history()["waits"].items()}
+
+    return _wait_history
+
+@atexit.register
+def save_wait_history ():
+    with _wait_history_lock:
+        if not _new_waits:
+            return
+
+        try:
+            # Parallel workers save at once, each adds its waits to what is on disk now
+            with open(WAIT_HISTORY_PATH + ".lock", "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+                history = read_wait_history()
+                history["runs"] += 1
+                for key, samples in _new_waits.items():
+                    entry = history["waits"].setdefault(key, {"samples": []})
+                    entry["samples"] += samples
+                    del entry["samples"][:-WAIT_HISTORY_SIZE]
+                    entry["run"] = history["runs"]
+
+                # Locators of removed tests and changed pages are dropped
+                history["waits"] = {key: entry for key, entry in history["waits"].items() if history["runs"] - entry["run"] < WAIT_HISTORY_RUNS}
+
+                # Rename replaces file at once, readers never see half written history
+                directory = os.path.dirname(os.path.abspath(WAIT_HISTORY_PATH))
+                descriptor, temporary_path = tempfile.mkstemp(dir = directory, prefix = ".wait_history.")
+                try:
+                    with os.fdopen(descriptor, "w") as history_file:
+                        json.dump(history, history_file)
+                    os.replace(temporary_path, WAIT_HISTORY_PATH)
+                except OSError:
+                    os.unlink(temporary_path)
+                    raise
+        except OSError:
+            pass
+
+        _new_waits.clear()
+
+def wait_timeout (key, default):
+    if not ADAPTIVE_TIMEOUTS:
+        return default
+
+    with _wait_history_lock:
+        samples = list(wait_history().get(key, []))
+
+    # Static delay until locator has enough history
+    if len(samples) < WAIT_MIN_SAMPLES:
+        return default
+
+    timeout = percentile(samples, WAIT_TIMEOUT_PERCENTILE) * WAIT_TIMEOUT_FACTOR + WAIT_TIMEOUT_MARGIN
+    return min(max(timeout, WAIT_TIMEOUT_FLOOR), WAIT_TIMEOUT_CEILING)
+
+def adaptive_wait (driver, key, default, condition):
+    timeout = wait_timeout(key, default)
+
+    # Timed out waits are not recorded, broken page would stretch timeouts
+    start = time.perf_counter()
+    result = WebDriverWait(driver, timeout).until(condition)
+    elapsed = time.perf_counter() - start
+
+    with _wait_history_lock:
+        samples = wait_history().setdefault(key, [])
+        samples.append(round(elapsed, 3))
+        del samples[:-WAIT_HISTORY_SIZE]
+        _new_waits.setdefault(key, []).append(round(elapsed, 3))
+
+    if elapsed >= timeout * WAIT_NEAR_BUDGET:
+        near_budget_waits.append((key, elapsed, timeout))
+        logger.warning("%s took %.2f s of %.2f s timeout", key, elapsed, timeout)
+
+    return result
+
+def url_key (url):
+    # Same page of every stack shares history, whatever its host and port
+    return urlsplit(url).path or "/"
+
+# Key is locator template for identifiers built from run data, e.g. vote counts or names
+def find_element (driver, identifier, by = By.CLASS_NAME, longDelay = False, key = None):
     delay = PAGE_LONG_LOAD_DELAY if longDelay else PAGE_LOAD_DELAY
-    return WebDriverWait(driver, delay).until(EC.presence_of_element_located((by, identifier)))
+    with step("wait.find_element"):
+        return adaptive_wait(driver, "find_element %s=%s" % (by, key or identifier), delay, EC.presence_of_element_located((by, identifier)))
+
+def find_clickable_element (driver, identifier, by = By.CLASS_NAME, key = None):
+    with step("wait.find_clickable_element"):
+        return adaptive_wait(driver, "find_clickable_element %s=%s" % (by, key or identifier), PAGE_LOAD_DELAY, EC.element_to_be_clickable((by, identifier)))
+
+def url_origin (url):
+    parts = urlsplit(url)
+    return "%s://%s" % (parts.scheme, parts.netloc) if parts.scheme in ("http", "https") else None
+
+def record_origin (driver, url):
+    origin = url_origin(url)
+    if origin is not None:
+        with _visited_origins_lock:
+            _visited_origins.setdefault(driver, set()).add(origin)
+
+def take_visited_origins (driver):
+    with _visited_origins_lock:
+        return _visited_origins.pop(driver, set())
+
+def page_loaded (driver):
+    return driver.execute_script(NEW_DOCUMENT_SCRIPT)
+
+def load_page (driver, url):
+    # With page load strategy none get returns at once, waits would match elements of previous page
+    try:
+        driver.execute_script(LEAVING_SCRIPT)
+    except WebDriverException:
+        pass
+
+    driver.get(url)
 
-def find_clickable_element (driver, identifier, by = By.CLASS_NAME):
-    return WebDriverWait(driver, PAGE_LOAD_DELAY).until(EC.element_to_be_clickable((by, identifier)))
+def open_page (driver, url, key = None):
+    load_page(driver, url)
+    record_origin(driver, url)
+    with step("wait.open_page"):
+        adaptive_wait(driver, "open_page %s" % (key or url_key(url)), PAGE_LONG_LOAD_DELAY, page_loaded)
 
 def wait_for_redirect (driver, target_url):
-    WebDriverWait(driver, PAGE_LOAD_DELAY).until(lambda driver: driver.current_url != target_url)
+    with step("wait.wait_for_redirect"):
+        adaptive_wait(driver, "wait_for_redirect %s" % url_key(target_url), PAGE_LOAD_DELAY, lambda driver: driver.current_url != target_url)
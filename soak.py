@@ -0,0 +1,290 @@
+import os
+import sys
+import csv
+import time
+import asyncio
+import argparse
+import resource
+import threading
+from dotenv import load_dotenv
+
+import requests
+from selenium.common.exceptions import WebDriverException
+
+from config import VT_URL, STATISTICS_URL
+from driver_pool import DriverPool
+from http_voting import Ballot, parse_candidates
+from load_generator import run_load
+from metrics import LatencyRecorder, percentile
+from selenium_helper import open_page
+from stack_api import StackApiError, gateway_statistics, gateway_synchronize, elastic_status, elastic_pending, elastic_synchronize
+
+load_dotenv()
+SOAK_REPORT_PATH = os.getenv("SOAK_REPORT_PATH", "soak_report.csv")
+BROWSER_PROCESSES = {"firefox", "firefox-bin", "geckodriver", "chrome", "chromium", "chromedriver"}
+
+COLUMNS = [
+    "window", "elapsed", "votes", "rate", "sync_failed", "statistics_failed",
+    "vote_median_ms", "vote_p95_ms", "vote_p99_ms",
+    "gateway_synchronize_ms", "elastic_synchronize_ms", "statistics_page_ms",
+    "gateway_unsynchronized", "elastic_unsynchronized",
+    "rss_mb", "open_fds", "browser_processes", "flags",
+]
+
+
+def rss_mb ():
+    # Current RSS from procfs, peak RSS where procfs is missing
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def open_fds ():
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return None
+
+
+def browser_processes ():
+    # Counts browsers and drivers on the machine, leaked ones included
+    try:
+        pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]
+    except OSError:
+        return None
+
+    count = 0
+    for pid in pids:
+        try:
+            with open("/proc/%s/comm" % pid) as comm:
+                if comm.read().strip() in BROWSER_PROCESSES:
+                    count += 1
+        except OSError:
+            continue
+    return count
+
+
+def backlogs ():
+    try:
+        return gateway_statistics()["unsyncronized_count"], elastic_pending(elastic_status())
+    except (StackApiError, requests.RequestException, ValueError, KeyError):
+        return None, None
+
+
+def run_scheduled (stop, interval, name, call, recorder, errors):
+    while not stop.wait(interval):
+        start = time.perf_counter()
+        try:
+            response = call()
+        except requests.RequestException:
+            errors[name] = errors.get(name, 0) + 1
+            continue
+
+        if response.status_code != 200:
+            errors[name] = errors.get(name, 0) + 1
+            continue
+        recorder.record(name, time.perf_counter() - start)
+
+
+class SoakMonitor:
+    def __init__ (self, writer, latency_drift, backlog_windows, rss_growth):
+        self.writer = writer
+        self.latency_drift = latency_drift
+        self.backlog_windows = backlog_windows
+        self.rss_growth = rss_growth
+        self.rows = []
+        self.baseline = None
+        self.growing = {"gateway_unsynchronized": 0, "elastic_unsynchronized": 0}
+        self.flags = []
+
+    def check (self, row):
+        flags = []
+
+        # First window with votes is the reference for drift
+        if self.baseline is None and row["vote_p95_ms"] is not None:
+            self.baseline = row
+
+        if self.baseline is not None and row["vote_p95_ms"] is not None:
+            if row["vote_p95_ms"] > self.baseline["vote_p95_ms"] * (1 + self.latency_drift):
+                flags.append("latency_drift")
+            if self.rss_growth and row["rss_mb"] > self.baseline["rss_mb"] * (1 + self.rss_growth):
+                flags.append("rss_growth")
+
+        # Backlog is sawtooth between synchronizations, flag only steady growth
+        previous = self.rows[-1] if self.rows else None
+        for key in self.growing:
+            if previous is not None and row[key] is not None and previous[key] is not None and row[key] > previous[key]:
+                self.growing[key] += 1
+            else:
+                self.growing[key] = 0
+            if self.backlog_windows and self.growing[key] >= self.backlog_windows:
+                flags.append(key.replace("_unsynchronized", "_backlog_growth"))
+
+        return flags
+
+    def window (self, index, elapsed, samples, votes, sync_failed, statistics_failed, window_seconds):
+        gateway_backlog, elastic_backlog = backlogs()
+        vote_latencies = samples.get("vote", [])
+
+        def milliseconds (name, p = 50):
+            value = percentile(samples.get(name, []), p)
+            return round(value * 1000, 1) if value is not None else None
+
+        row = {
+            "window": index,
+            "elapsed": round(elapsed, 1),
+            "votes": votes,
+            "rate": round(votes / window_seconds, 2),
+            "sync_failed": sync_failed,
+            "statistics_failed": statistics_failed,
+            "vote_median_ms": milliseconds("vote"),
+            "vote_p95_ms": milliseconds("vote", 95),
+            "vote_p99_ms": milliseconds("vote", 99),
+            "gateway_synchronize_ms": milliseconds("gateway_synchronize"),
+            "elastic_synchronize_ms": milliseconds("elastic_synchronize"),
+            "statistics_page_ms": milliseconds("statistics_page"),
+            "gateway_unsynchronized": gateway_backlog,
+            "elastic_unsynchronized": elastic_backlog,
+            "rss_mb": round(rss_mb(), 1),
+            "open_fds": open_fds(),
+            "browser_processes": browser_processes(),
+        }
+
+        flags = self.check(row) if vote_latencies else []
+        row["flags"] = " ".join(flags)
+        self.rows.append(row)
+        self.flags += [(index, flag) for flag in flags]
+
+        self.writer.writerow(row)
+        return row
+
+
+def soak (args, ballot, output):
+    writer = csv.DictWriter(output, fieldnames = COLUMNS)
+    writer.writeheader()
+    output.flush()
+
+    monitor = SoakMonitor(writer, args.latency_drift, args.backlog_windows, args.rss_growth)
+    recorder = LatencyRecorder()
+    errors = {}
+    stop = threading.Event()
+    counts = {"votes": 0}
+    counts_lock = threading.Lock()
+    result = {}
+
+    def vote_done ():
+        with counts_lock:
+            counts["votes"] += 1
+
+    def cast_votes ():
+        result.update(asyncio.run(run_load(args.terminals, args.rate, args.duration, ballot, vt_urls = args.vt_urls or [VT_URL], steady = True, on_vote = vote_done, recorder = recorder)))
+
+    schedules = []
+    if args.gateway_sync_interval:
+        schedules.append((args.gateway_sync_interval, "gateway_synchronize", gateway_synchronize))
+    if args.elastic_sync_interval:
+        schedules.append((args.elastic_sync_interval, "elastic_synchronize", elastic_synchronize))
+
+    threads = [threading.Thread(target = cast_votes, daemon = True)]
+    threads += [threading.Thread(target = run_scheduled, args = (stop, interval, name, call, recorder, errors), daemon = True) for interval, name, call in schedules]
+
+    driver_pool = DriverPool(size = 1) if args.browser else None
+    driver = driver_pool.acquire() if driver_pool else None
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    try:
+        index = 0
+        while threads[0].is_alive():
+            threads[0].join(timeout = max(0, start + (index + 1) * args.window - time.perf_counter()))
+
+            # Keep browser busy the way statistics checks do during the day
+            statistics_failed = 0
+            if driver is not None:
+                page_start = time.perf_counter()
+                try:
+                    open_page(driver, STATISTICS_URL)
+                    recorder.record("statistics_page", time.perf_counter() - page_start)
+                except WebDriverException:
+                    # Slow or broken page is a finding of the window, not end of soak
+                    statistics_failed = 1
+
+            with counts_lock:
+                votes, counts["votes"] = counts["votes"], 0
+
+            window_seconds = min(args.window, time.perf_counter() - start - index * args.window)
+            row = monitor.window(index, time.perf_counter() - start, recorder.take(), votes, sum(errors.values()), statistics_failed, window_seconds)
+            output.flush()
+            errors.clear()
+
+            if args.verbose:
+                print("window %(window)d: %(votes)d votes, p95 %(vote_p95_ms)s ms, backlog %(gateway_unsynchronized)s/%(elastic_unsynchronized)s, rss %(rss_mb)s MB %(flags)s" % row)
+            index += 1
+    finally:
+        stop.set()
+        for thread in threads[1:]:
+            thread.join()
+        if driver_pool:
+            driver_pool.release(driver)
+            driver_pool.close()
+
+    return result, monitor
+
+
+def print_report (result, monitor, path):
+    print("Votes: %d completed, %d failed in %.0f s, %d windows written to %s" % (result.get("completed", 0), result.get("failed", 0), result.get("elapsed", 0), len(monitor.rows), path))
+
+    for step, count in result.get("errors", {}).items():
+        print("  errors %-16s %d" % (step, count))
+
+    if not monitor.rows:
+        return
+
+    statistics_failed = sum(row["statistics_failed"] for row in monitor.rows)
+    if statistics_failed:
+        print("Statistics page failed to load in %d windows" % statistics_failed)
+
+    first, last = monitor.rows[0], monitor.rows[-1]
+    print("RSS %.1f -> %.1f MB, open fds %s -> %s, browser processes %s -> %s" % (first["rss_mb"], last["rss_mb"], first["open_fds"], last["open_fds"], first["browser_processes"], last["browser_processes"]))
+
+    for index, flag in monitor.flags:
+        print("  window %d: %s" % (index, flag))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Vote at steady rate for hours with periodic synchronization and track drift")
+    parser.add_argument("--terminals", type = int, default = 10)
+    parser.add_argument("--rate", type = float, default = 1.0, help = "votes per second")
+    parser.add_argument("--duration", type = float, default = 3600.0, help = "seconds")
+    parser.add_argument("--window", type = float, default = 60.0, help = "seconds per row of time series")
+    parser.add_argument("--party", type = int, default = None)
+    parser.add_argument("--candidates", type = parse_candidates, default = [])
+    parser.add_argument("--vt-url", action = "append", dest = "vt_urls")
+    parser.add_argument("--gateway-sync-interval", type = float, default = 30.0, help = "0 relies on stack synchronizing on its own")
+    parser.add_argument("--elastic-sync-interval", type = float, default = 60.0, help = "0 relies on stack synchronizing on its own")
+    parser.add_argument("--browser", action = "store_true", help = "load statistics app in browser every window")
+    parser.add_argument("--latency-drift", type = float, default = 0.5, help = "flag window when vote p95 exceeds first window by this share")
+    parser.add_argument("--backlog-windows", type = int, default = 3, help = "flag backlog growing this many windows in a row, 0 disables")
+    parser.add_argument("--rss-growth", type = float, default = 0.5, help = "flag window when RSS exceeds first window by this share, 0 disables")
+    parser.add_argument("--output", default = SOAK_REPORT_PATH)
+    parser.add_argument("--verbose", action = "store_true")
+    args = parser.parse_args()
+
+    with open(args.output, "w", newline = "") as output:
+        result, monitor = soak(args, Ballot(args.party, args.candidates), output)
+
+    print_report(result, monitor, args.output)
+
+    if result.get("failed") or monitor.flags:
+        sys.exit(1)
@@ -0,0 +1,40 @@
+import http_client
+
+SYNCHRONIZATION_MESSAGE = "votes were successfully synchronized"
+# Votes indexed per elastic synchronization call when tester drives it
+ELASTIC_BATCH_SIZE = 1000
+
+
+class StackApiError (Exception):
+    pass
+
+
+def gateway_statistics (gateway = http_client.gateway):
+    response = gateway.post("synchronization-service-api/statistics", idempotent = True)
+    if response.status_code != 200:
+        raise StackApiError("GATEWAY statistics failed with status %s" % response.status_code)
+    return response.json()["statistics"]
+
+
+def gateway_synchronize (gateway = http_client.gateway, **kwargs):
+    return gateway.post("synchronization-service-api/synchronize", **kwargs)
+
+
+def elastic_status (server = http_client.server):
+    response = server.get("elastic/synchronization-status")
+    if response.status_code != 200:
+        raise StackApiError("SERVER synchronization status failed with status %s" % response.status_code)
+    return response.json()["data"]
+
+
+def elastic_pending (status):
+    # Votes stored on server and not indexed yet
+    return status["total_votes"] - status["synchronized_votes"]
+
+
+def elastic_synchronize (number = ELASTIC_BATCH_SIZE, server = http_client.server, **kwargs):
+    return server.post("elastic/synchronize-votes-es", json = {"number": number}, **kwargs)
+
+
+def elastic_synchronized (response):
+    return response.status_code == 200 and SYNCHRONIZATION_MESSAGE in response.json()["message"]
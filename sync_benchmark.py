@@ -0,0 +1,135 @@
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+from config import VT_URL, GATEWAY_URL
+from http_client import ServiceClient, HTTP_CONNECT_TIMEOUT, HTTP_LONG_READ_TIMEOUT
+from http_voting import Ballot, HttpVoter, parse_candidates
+from results_store import save_run
+from stack_api import StackApiError, gateway_statistics, gateway_synchronize
+
+MAX_SYNCHRONIZE_CALLS = 1000
+
+
+def synchronize (gateway = http_client.gateway, read_timeout = HTTP_LONG_READ_TIMEOUT):
+    # Draining large backlog is the measured call, it outlasts usual read timeout
+    try:
+        response = gateway_synchronize(gateway, timeout = (HTTP_CONNECT_TIMEOUT, read_timeout or None))
+    except requests.Timeout:
+        raise SystemExit("GATEWAY synchronize did not finish within %g s, raise --timeout" % read_timeout)
+    except requests.RequestException as e:
+        raise SystemExit("GATEWAY synchronize failed: %s" % e)
+    if response.status_code != 200:
+        raise SystemExit("GATEWAY synchronize failed with status %s" % response.status_code)
+
+
+def drain (gateway = http_client.gateway, read_timeout = HTTP_LONG_READ_TIMEOUT):
+    calls = 0
+
+    while gateway_statistics(gateway)["unsyncronized_count"] > 0:
+        if calls >= MAX_SYNCHRONIZE_CALLS:
+            raise SystemExit("GATEWAY backlog not drained after %d synchronize calls" % calls)
+        synchronize(gateway, read_timeout)
+        calls += 1
+
+    return calls
+
+
+def build_backlog (size, ballot, vt_urls = (VT_URL,), gateway = http_client.gateway):
+    # One worker per VT, terminal holds only one inserted token at a time
+    voters = [HttpVoter(gateway = gateway, vt = ServiceClient("vt", vt_url)) for vt_url in vt_urls]
+
+    def cast_votes (voter, count):
+        for i in range(count):
+            voter.cast_vote(ballot)
+
+    with ThreadPoolExecutor(max_workers = len(voters)) as executor:
+        shares = [size // len(voters) + (1 if i < size % len(voters) else 0) for i in range(len(voters))]
+        for future in [executor.submit(cast_votes, voter, share) for voter, share in zip(voters, shares)]:
+            future.result()
+
+
+def run_benchmark (size, ballot, vt_urls = (VT_URL,), read_timeout = HTTP_LONG_READ_TIMEOUT):
+    gateway = ServiceClient("gateway", GATEWAY_URL, pool_size = len(vt_urls))
+
+    # Start from empty backlog
+    drain(gateway, read_timeout)
+
+    start = time.perf_counter()
+    build_backlog(size, ballot, vt_urls, gateway)
+    backlog_duration = time.perf_counter() - start
+
+    before = gateway_statistics(gateway)
+
+    start = time.perf_counter()
+    synchronize(gateway, read_timeout)
+    synchronize_duration = time.perf_counter() - start
+
+    # Count of calls needed if gateway synchronizes in batches
+    start = time.perf_counter()
+    extra_calls = drain(gateway, read_timeout)
+    drain_duration = synchronize_duration + time.perf_counter() - start
+
+    after = gateway_statistics(gateway)
+    synchronized = after["syncronized_count"] - before["syncronized_count"]
+
+    return {
+        "backlog": size,
+        "backlog_duration": backlog_duration,
+        "before": before,
+        "after": after,
+        "synchronized": synchronized,
+        "synchronize_calls": 1 + extra_calls,
+        "synchronize_duration": synchronize_duration,
+        "drain_duration": drain_duration,
+        "throughput": synchronized / drain_duration if drain_duration else 0,
+    }
+
+
+def print_report (results):
+    print("%10s %12s %10s %8s %12s %14s %12s %12s" % ("backlog", "backlog s", "synced", "calls", "drain s", "votes/s", "sync after", "unsync after"))
+    for result in results:
+        print("%10d %12.2f %10d %8d %12.2f %14.1f %12d %12d" % (
+            result["backlog"],
+            result["backlog_duration"],
+            result["synchronized"],
+            result["synchronize_calls"],
+            result["drain_duration"],
+            result["throughput"],
+            result["after"]["syncronized_count"],
+            result["after"]["unsyncronized_count"],
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure gateway to server synchronization throughput")
+    parser.add_argument("--backlog", type = int, nargs = "+", default = [100, 10000, 100000])
+    parser.add_argument("--party", type = int, default = None)
+    parser.add_argument("--candidates", type = parse_candidates, default = [])
+    parser.add_argument("--vt-url", action = "append", dest = "vt_urls")
+    parser.add_argument("--timeout", type = float, default = HTTP_LONG_READ_TIMEOUT, help = "read timeout of synchronize call in seconds, 0 waits without limit")
+    args = parser.parse_args()
+
+    ballot = Ballot(args.party, args.candidates)
+    results = []
+
+    try:
+        for size in args.backlog:
+            results.append(run_benchmark(size, ballot, args.vt_urls or [VT_URL], args.timeout))
+    except StackApiError as e:
+        sys.exit(str(e))
+
+    print_report(results)
+
+    metrics = {}
+    for result in results:
+        metrics["sync.%d.throughput" % result["backlog"]] = [result["throughput"]]
+        metrics["sync.%d.drain_duration" % result["backlog"]] = [result["drain_duration"]]
+    save_run("sync_benchmark", metrics)
+
+    if any(result["synchronized"] != result["backlog"] for result in results):
+        sys.exit("Not all votes of backlog were synchronized")
@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import time
+import argparse
+import unittest
+import subprocess
+
+import browser_timing
+from timing import recorder
+
+
+def test_ids (suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from test_ids(test)
+        else:
+            yield test.id()
+
+
+class TimedTestResult (unittest.TextTestResult):
+    def __init__ (self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = {}
+
+    def startTest (self, test):
+        self.started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest (self, test):
+        super().stopTest(test)
+        self.durations[test.id()] = time.perf_counter() - self.started
+
+
+def run_tests (result_path, ids):
+    suite = unittest.defaultTestLoader.loadTestsFromNames(ids)
+    result = unittest.TextTestRunner(verbosity = 2, resultclass = TimedTestResult).run(suite)
+
+    with open(result_path, "w") as result_file:
+        json.dump({
+            "run": result.testsRun,
+            "failures": [[test.id(), trace] for test, trace in result.failures],
+            "errors": [[test.id(), trace] for test, trace in result.errors],
+            "skipped": [test.id() for test, reason in result.skipped],
+            "durations": result.durations,
+            "samples": recorder.samples,
+            "browser_samples": browser_timing.recorder.samples,
+        }, result_file)
+
+    return result.wasSuccessful()
+
+
+def start_worker (result_path, ids, env):
+    # Output is read by caller, e.g. with communicate
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--result", result_path] + ids,
+        cwd = os.path.dirname(os.path.abspath(__file__)),
+        env = env,
+        stdout = subprocess.PIPE,
+        stderr = subprocess.STDOUT,
+        universal_newlines = True,
+    )
+
+
+def read_result (result_path, name, output):
+    try:
+        with open(result_path) as result_file:
+            return json.load(result_file)
+    except (OSError, ValueError):
+        # Worker died before writing result, e.g. stack not available
+        return {"run": 0, "failures": [], "errors": [[name, output[-2000:]]], "skipped": [], "durations": {}, "samples": {}, "browser_samples": {}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Run tests in worker process and write their result to JSON file")
+    parser.add_argument("--result", required = True)
+    parser.add_argument("ids", nargs = "+")
+    args = parser.parse_args()
+
+    sys.exit(0 if run_tests(args.result, args.ids) else 1)
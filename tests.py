@@ -1,130 +1,112 @@
 import os
 import sys
-import time
+import logging
 import unittest
-import requests
 from dotenv import load_dotenv
 
 # Selenium imports, set up
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
 
-from webdriver_manager.firefox import GeckoDriverManager
-
-from selenium_helper import is_text_present, click_on, find_element,  find_clickable_element, wait_for_redirect
-
-driver_options = Options()
-driver_options.headless = True
-driver_options.add_argument("--headless")
-driver_options.add_argument("--disable-gpu")
-driver_options.add_argument("--enable-javascript")
-driver_options.add_argument("--disable-blink-features=AutomationControlled")
+from selenium_helper import is_text_present, click_on, find_element,  find_clickable_element, wait_for_redirect, open_page
+from driver_pool import DriverPool
+import http_client
+from admin_api import ADMIN_SETUP_MODE, prepare_stack
+from bootstrap_benchmark import bootstrap_server
+from preflight import wait_for_stack, print_matrix, unavailable_services
+from timing import step, write_report, recorder
+import browser_timing
+from results_store import save_run, prefixed
+from readiness import wait_until, gateway_config_ready, vt_backend_ready, vt_frontend_ready, element_state
+from vote_ledger import VoteLedger, synchronize_and_reconcile
+from vt_pages import PartyPage, CandidatePage, SummaryPage
+from http_voting import HttpVoter
+from scenarios import load_catalogue, generate_ballots, cast_ballot_in_browser
+from config import GATEWAY_ADMIN_URL, STATISTICS_URL, ADMIN_PASSWORD
 
 # Load environment variables
 load_dotenv()
-PAGE_LOAD_DELAY = os.getenv("PAGE_LOAD_DELAY") # seconds
-VT_FRONTEND_URL = os.getenv("VT_URL") + "frontend/"
-VT_BACKEND_URL = os.getenv("VT_URL") + "backend/"
-GATEWAY_URL = os.getenv("GATEWAY_URL")
-GATEWAY_ADMIN_URL = os.getenv("GATEWAY_URL") + "admin-frontend/"
-SERVER_URL = os.getenv("SERVER_URL")
-STATISTICS_URL = os.getenv("STATISTICS_URL")
-ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+SCENARIO_VOTES = int(os.getenv("SCENARIO_VOTES", "0")) # generated ballots voted in browser
+SCENARIO_SEED = os.getenv("SCENARIO_SEED")
 
-SYNCHRONIZATION_MESSAGE = "votes were successfully synchronized"
+# Created from stack state once server is set up
+ledger = None
 
-elections_on = False
-vt_registration_on = False
-statistics_published = False
+# Browsers are started once and shared by all tests
+driver_pool = DriverPool()
 
-all_votes_count = 0
-synchronized_votes_count = 0
-unsynchronized_votes_count = 0
+preflight_results = {}
 
 
 def set_up_server ():
-    # Do import
-    response = requests.post(SERVER_URL + "database/import-data")
+    # Do import, seed data and set up elastic
+    bootstrap_server(number_of_votes = 1)
+
+
+def setUpModule ():
+    global ledger
+
+    # Check all services at once, wait until whole stack is up
+    preflight_results.update(wait_for_stack())
+    print_matrix(preflight_results, file = sys.stderr)
+
+    if unavailable_services(preflight_results):
+        raise SystemExit("Not available: %s" % ", ".join(unavailable_services(preflight_results)))
+
+    # Set up server if everything OK
+    set_up_server()
+
+    # Turn registration and elections on, publish results
+    if ADMIN_SETUP_MODE == "api":
+        prepare_stack()
 
-    # Seed data
-    response = requests.post(SERVER_URL + "database/seed-data?number_of_votes=1")
+    # Expected counts start from votes and results stack already has
+    ledger = VoteLedger.from_stack()
 
-    # Set up elastic
-    response = requests.post(SERVER_URL + "elastic/setup-elastic-vote-index")
+    # Wait for VT to be ready, any voting test may run first
+    wait_until(gateway_config_ready, "Gateway config")
+    wait_until(vt_backend_ready, "VT backend")
 
 
 class ServicesAvailabityTest (unittest.TestCase):
+    def assertAvailable (self, name):
+        result = preflight_results[name]
+        self.assertTrue(result["available"], "%s not available! (%s)" % (name, result["error"] or result["status"]))
+
     def test_vt_frontend_available (self):
-        try:
-            response = requests.get(VT_FRONTEND_URL)
-            self.passing = self.assertEqual(200, response.status_code)
-        except requests.exceptions.HTTPError as e:
-            raise SystemExit("VT frontend not available!")
+        self.assertAvailable("VT frontend")
 
     def test_gateway_voting_service_available (self):
-        try:
-            response = requests.get(GATEWAY_URL + "voting-service-api/")
-            self.passing = self.assertEqual(200, response.status_code)
-        except requests.exceptions.HTTPError as e:
-            raise SystemExit("GATEWAY voting service not available!")
+        self.assertAvailable("GATEWAY voting service")
 
     def test_gateway_statevector_available (self):
-        try:
-            response = requests.get(GATEWAY_URL + "statevector/config/config.json")
-            self.passing = self.assertEqual(200, response.status_code)
-        except requests.exceptions.HTTPError as e:
-            raise SystemExit("GATEWAY statevector not available!")
+        self.assertAvailable("GATEWAY statevector")
 
     def test_gateway_voting_process_manager_available (self):
-        try:
-            response = requests.get(GATEWAY_URL + "voting-process-manager-api/")
-            self.passing = self.assertEqual(200, response.status_code)
-        except requests.exceptions.HTTPError as e:
-            raise SystemExit("GATEWAY voting process manager not available!")
+        self.assertAvailable("GATEWAY voting process manager")
 
     def test_server_available (self):
-        try:
-            response = requests.get(SERVER_URL)
-            self.passing = self.assertEqual(200, response.status_code)
-        except requests.exceptions.HTTPError as e:
-            raise SystemExit("SERVER not available!")
-
-        # Set up server if everything OK
-        set_up_server()
+        self.assertAvailable("SERVER")
 
     def test_statistics_app_available (self):
-        try:
-            response = requests.get(STATISTICS_URL)
-            self.passing = self.assertEqual(200, response.status_code)
-        except requests.exceptions.HTTPError as e:
-            raise SystemExit("STATISTICS APP not available!")
+        self.assertAvailable("STATISTICS APP")
 
 
-class VotingTest (unittest.TestCase):
-    INSERT_TOKEN_IMAGE_PATH= "/frontend/img/icons/insert.png"
+# Runs before VotingTest, test classes are loaded in alphabetical order
+@unittest.skipUnless(ADMIN_SETUP_MODE == "ui", "Stack is prepared through admin API")
+class AdminUiTest (unittest.TestCase):
+    # Final texts of state elements, anything else is still loading
+    REGISTRATION_STARTED = "Registrácia spustená."
+    REGISTRATION_STATES = [REGISTRATION_STARTED, "Registrácia nespustená."]
+    ELECTIONS_STARTED = "Voľby spustené."
+    ELECTION_STATES = [ELECTIONS_STARTED, "Voľby nespustené."]
 
     def setUp (self):
-        global vt_registration_on
-        global elections_on
-        global statistics_published
-
-        self.driver = webdriver.Firefox(executable_path = GeckoDriverManager().install(), options = driver_options)
-
-        if not vt_registration_on:
-            self.turn_on_vt_registration()
-            vt_registration_on = True
+        self.driver = driver_pool.acquire()
 
-        if not elections_on:
-            self.turn_on_elections_if_not_on()
-            elections_on = True
-
-        if not statistics_published:
-            self.publish_statistics()
-            statistics_published = True
+    def test_prepare_stack_through_ui (self):
+        self.turn_on_vt_registration()
+        self.turn_on_elections_if_not_on()
+        self.publish_statistics()
 
     def enter_gateway_pin (self):
         driver = self.driver
@@ -137,7 +119,7 @@ class VotingTest (unittest.TestCase):
     def turn_on_vt_registration (self):
         driver = self.driver
 
-        driver.get(GATEWAY_ADMIN_URL + "home/terminals")
+        open_page(driver, GATEWAY_ADMIN_URL + "home/terminals")
         find_element(driver, "//main", by = By.XPATH)
 
         # Enter PIN
@@ -155,9 +137,9 @@ class VotingTest (unittest.TestCase):
         find_element(driver, "registration-state", by = By.ID)
 
         # Wait for status update
-        time.sleep(2)
+        state = wait_until(lambda: element_state(driver, "registration-state", self.REGISTRATION_STATES), "Registration state")
 
-        if not is_text_present(driver, "Registrácia spustená."):
+        if state != self.REGISTRATION_STARTED:
             element = find_clickable_element(driver, "//button[text()='Spustiť registráciu']", by = By.XPATH)
             click_on(driver, element)
 
@@ -166,7 +148,7 @@ class VotingTest (unittest.TestCase):
     def turn_on_elections_if_not_on (self):
         driver = self.driver
 
-        driver.get(GATEWAY_ADMIN_URL + "home/elections")
+        open_page(driver, GATEWAY_ADMIN_URL + "home/elections")
         find_element(driver, "//main", by = By.XPATH)
 
         # Enter PIN
@@ -184,9 +166,9 @@ class VotingTest (unittest.TestCase):
         find_element(driver, "election-state", by = By.ID)
 
         # Wait for status update
-        time.sleep(2)
+        state = wait_until(lambda: element_state(driver, "election-state", self.ELECTION_STATES), "Election state")
 
-        if not is_text_present(driver, "Voľby spustené."):
+        if state != self.ELECTIONS_STARTED:
             element = find_clickable_element(driver, "//button[text()='Spustiť voľby']", by = By.XPATH)
             click_on(driver, element)
 
@@ -195,13 +177,13 @@ class VotingTest (unittest.TestCase):
     def publish_statistics (self):
         driver = self.driver
 
-        driver.get(STATISTICS_URL)
+        open_page(driver, STATISTICS_URL)
         find_element(driver, "//main", by = By.XPATH)
 
         # Check if statistics are hidden
         self.assertTrue(is_text_present(driver, "Výsledky ešte neboli publikované"))
 
-        driver.get(STATISTICS_URL + "admin/home")
+        open_page(driver, STATISTICS_URL + "admin/home")
         find_element(driver, "//main", by = By.XPATH)
 
         element = find_element(driver, "name", by = By.ID)
@@ -224,372 +206,258 @@ class VotingTest (unittest.TestCase):
         find_element(driver, "//div[text()='Výsledky publikované.']", by = By.XPATH)
         self.assertTrue(is_text_present(driver, "Výsledky publikované"))
 
-        driver.get(STATISTICS_URL)
+        open_page(driver, STATISTICS_URL)
         find_element(driver, "//main", by = By.XPATH)
 
         # Check if statistics are hidden
         self.assertFalse(is_text_present(driver, "Výsledky ešte neboli publikované"))
 
+    def tearDown (self):
+        driver_pool.release(self.driver)
 
-    def test_select_none (self):
-        global all_votes_count
-        global synchronized_votes_count
-        global unsynchronized_votes_count
 
+class VotingTest (unittest.TestCase):
+    INSERT_TOKEN_IMAGE_PATH= "/frontend/img/icons/insert.png"
+
+    @classmethod
+    def setUpClass (cls):
+        # Wait for FE to be ready
+        driver = driver_pool.acquire()
+        try:
+            wait_until(lambda: vt_frontend_ready(driver), "VT frontend")
+        finally:
+            driver_pool.release(driver)
+
+    def setUp (self):
+        self.driver = driver_pool.acquire()
+
+    def test_select_none (self):
         driver = self.driver
 
         # Get token
-        response = requests.post(GATEWAY_URL + "token-manager-api/tokens/create")
-        self.passing = self.assertEqual(200, response.status_code)
-        token = response.json()["token"]
+        with step("create_token"):
+            response = http_client.gateway.post("token-manager-api/tokens/create")
+            self.passing = self.assertEqual(200, response.status_code)
+            token = response.json()["token"]
 
         # Activate token
-        response = requests.post(GATEWAY_URL + 'token-manager-api/tokens/writer/update', json = {"token": token})
-        self.passing = self.assertEqual(200, response.status_code)
-
-        # Wait for FE to be ready
-        time.sleep(20)
-        driver.get(VT_FRONTEND_URL)
-        find_element(driver, "//div[text()='Načítajte NFC tag']", by = By.XPATH)
+        with step("activate_token"):
+            response = http_client.gateway.post('token-manager-api/tokens/writer/update', json = {"token": token})
+            self.passing = self.assertEqual(200, response.status_code)
 
         # Use token
-        response = requests.post(VT_BACKEND_URL + "token", json = token)
-        self.passing = self.assertEqual(200, response.status_code)
+        with step("insert_token"):
+            response = http_client.vt.post("backend/token", json = token)
+            self.passing = self.assertEqual(200, response.status_code)
 
         # Get candidating parties
-        driver.get(VT_FRONTEND_URL + "parliament/party")
-
-        find_element(driver, "//h2[text()='Kandidujúce strany:']", by = By.XPATH)
+        party_page = PartyPage(driver)
+        with step("party_page_render"):
+            party_page.open()
 
         # Decide for no party
-        element = find_clickable_element(driver, "//button[text()='Potvrdiť']", by = By.XPATH)
-        click_on(driver, element)
+        party_page.confirm()
 
         # Confirm sending vote with no selection
-        self.assertTrue(is_text_present(driver, "Naozaj chcete odoslať prázdny hlas?"))
-        element = find_clickable_element(driver, "//button[text()='Odoslať prázdny hlas']", by = By.XPATH)
-        click_on(driver, element)
+        self.assertEqual([], party_page.missing_texts(["Naozaj chcete odoslať prázdny hlas?"]))
+        party_page.click(PartyPage.SEND_EMPTY)
 
         # Warning of no selection
-        find_element(driver, "//div[text()='Nezvolili ste žiadnu politickú stranu']", by = By.XPATH)
-        find_element(driver, "//div[text()='Nezvolili ste žiadneho kandidáta']", by = By.XPATH)
+        summary_page = SummaryPage(driver)
+        summary_page.find(SummaryPage.NO_PARTY)
+        summary_page.find(SummaryPage.NO_CANDIDATE)
 
         # Send vote
-        element = find_clickable_element(driver, "//button[text()='Odoslať hlas']", by = By.XPATH)
-        click_on(driver, element)
-
-        find_element(driver, "//div[text()='Váš hlas bol započítaný']", by = By.XPATH, longDelay = True)
-
-        all_votes_count += 1
-        unsynchronized_votes_count += 1
-
-        # Check if vote is saved in gateway
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/statistics")
-        self.assertEqual(200, response.status_code)
-        statistics_result = response.json()
+        with step("vote_submission"):
+            summary_page.send_vote()
 
-        self.assertTrue(statistics_result["statistics"]["all_count"] == all_votes_count)
-        self.assertTrue(statistics_result["statistics"]["syncronized_count"] == synchronized_votes_count)
-        self.assertTrue(statistics_result["statistics"]["unsyncronized_count"] == unsynchronized_votes_count)
+        ledger.record(token)
 
-        # Synchronize votes in gateway with server
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/synchronize")
-        self.assertEqual(200, response.status_code)
-
-        unsynchronized_votes_count -= 1
-        synchronized_votes_count += 1
-
-        # Check if vote is marked as synchronized
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/statistics")
-        self.assertEqual(200, response.status_code)
-        statistics_result = response.json()
-
-        self.assertTrue(statistics_result["statistics"]["all_count"] == all_votes_count)
-        self.assertTrue(statistics_result["statistics"]["syncronized_count"] == synchronized_votes_count)
-        self.assertTrue(statistics_result["statistics"]["unsyncronized_count"] == unsynchronized_votes_count)
-
-        # Check server statistics
-        response = requests.get(SERVER_URL + "elastic/synchronization-status")
-        election_status = response.json()
-
-        # There is +1 vote in server because of initial seed
-        self.assertTrue(election_status["data"]["total_votes"] == all_votes_count + 1)
-
-        # Do elastic search synchronize
-        response = requests.post(SERVER_URL + "elastic/synchronize-votes-es", json = {"number": 100})
-        synchronize_response = response.json()
-
-        self.assertTrue(SYNCHRONIZATION_MESSAGE in synchronize_response["message"])
-
-        # Check votes in statistics app
-        driver.get(STATISTICS_URL)
-        find_element(driver, "//main", by = By.XPATH)
-
-        # Check count of all votes
-        find_element(driver, "//div[contains(@class, 'elections-statistics')]//tbody[//th[text() = 'Počet hlasov spolu:'] and //td[text() = '%s']]" % str(all_votes_count + 1), by = By.XPATH)
+        # Check gateway, server and statistics app in batches of votes
+        if ledger.reconcile_due():
+            self.assertEqual([], synchronize_and_reconcile(ledger, driver))
 
 
     def test_select_party_only (self):
-        global all_votes_count
-        global synchronized_votes_count
-        global unsynchronized_votes_count
-
         driver = self.driver
 
         # Get token
-        response = requests.post(GATEWAY_URL + "token-manager-api/tokens/create")
-        self.passing = self.assertEqual(200, response.status_code)
-        token = response.json()["token"]
+        with step("create_token"):
+            response = http_client.gateway.post("token-manager-api/tokens/create")
+            self.passing = self.assertEqual(200, response.status_code)
+            token = response.json()["token"]
 
         # Activate token
-        response = requests.post(GATEWAY_URL + 'token-manager-api/tokens/writer/update', json = {"token": token})
-        self.passing = self.assertEqual(200, response.status_code)
+        with step("activate_token"):
+            response = http_client.gateway.post('token-manager-api/tokens/writer/update', json = {"token": token})
+            self.passing = self.assertEqual(200, response.status_code)
 
-        response = requests.post(VT_BACKEND_URL + "token", json = token)
-        self.passing = self.assertEqual(200, response.status_code)
+        # Use token
+        with step("insert_token"):
+            response = http_client.vt.post("backend/token", json = token)
+            self.passing = self.assertEqual(200, response.status_code)
 
         # Get candidating parties
-        driver.get(VT_FRONTEND_URL + "parliament/party")
-
-        find_element(driver, "//h2[text()='Kandidujúce strany:']", by = By.XPATH)
+        party_page = PartyPage(driver)
+        with step("party_page_render"):
+            party_page.open()
 
         # Decide for Sme Rodina party
-        element = find_clickable_element(driver, "(//input[@type='checkbox'])[4]", by = By.XPATH)
-        click_on(driver, element)
+        party_page.select_party(4)
+        party_page.confirm()
 
-        element = find_clickable_element(driver, "//button[text()='Potvrdiť']", by = By.XPATH)
-        click_on(driver, element)
-
-        find_element(driver, "modal-content")
-        self.assertTrue(is_text_present(driver, "Zvolili ste"))
-        self.assertTrue(is_text_present(driver, "SME RODINA"))
-        element = find_clickable_element(driver, "(//button[text()='Potvrdiť'])[2]", by = By.XPATH)
-        click_on(driver, element)
+        party_page.find(PartyPage.MODAL)
+        self.assertEqual([], party_page.missing_texts(["Zvolili ste", "SME RODINA"]))
+        party_page.confirm_party()
 
         # List of candidates present
-        find_element(driver, "//h2[text()='Kandidáti']", by = By.XPATH)
-        find_element(driver, "//span[text()='Meno']", by = By.XPATH)
-        self.assertTrue(is_text_present(driver, "Boris Kollár"))
+        candidate_page = CandidatePage(driver)
+        candidate_page.wait_for_candidates()
+        self.assertEqual([], candidate_page.missing_texts(["Boris Kollár"]))
 
         # Decide for no candidate
-        element = find_clickable_element(driver, "//button[text()='Potvrdiť']", by = By.XPATH)
-        click_on(driver, element)
+        candidate_page.confirm()
 
         # Confirm sending vote with no selection
-        self.assertTrue(is_text_present(driver, "potvrdiť odoslanie prázdneho hlasu?"))
-        element = find_clickable_element(driver, "//button[text()='Pokračovať']", by = By.XPATH)
-        click_on(driver, element)
+        self.assertEqual([], candidate_page.missing_texts(["potvrdiť odoslanie prázdneho hlasu?"]))
+        candidate_page.continue_to_summary()
 
         # Warning of no candidate selected
-        find_element(driver, "//h2[text()='Zvolená strana']", by = By.XPATH)
-        self.assertTrue(is_text_present(driver, "SME RODINA"))
-        self.assertTrue(is_text_present(driver, "Nezvolili ste žiadneho kandidáta"))
+        summary_page = SummaryPage(driver)
+        summary_page.find(SummaryPage.HEADING)
+        self.assertEqual([], summary_page.missing_texts(["SME RODINA", "Nezvolili ste žiadneho kandidáta"]))
 
         # Send vote
-        element = find_clickable_element(driver, "//button[text()='Odoslať hlas']", by = By.XPATH)
-        click_on(driver, element)
-
-        find_element(driver, "//div[text()='Váš hlas bol započítaný']", by = By.XPATH, longDelay = True)
-
-        all_votes_count += 1
-        unsynchronized_votes_count += 1
-
-        # Check if vote is saved in gateway
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/statistics")
-        self.assertEqual(200, response.status_code)
-        statistics_result = response.json()
-
-        self.assertTrue(statistics_result["statistics"]["all_count"] == all_votes_count)
-        self.assertTrue(statistics_result["statistics"]["syncronized_count"] == synchronized_votes_count)
-        self.assertTrue(statistics_result["statistics"]["unsyncronized_count"] == unsynchronized_votes_count)
-
-        # Synchronize votes in gateway with server
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/synchronize")
-        self.assertEqual(200, response.status_code)
-
-        unsynchronized_votes_count -= 1
-        synchronized_votes_count += 1
-
-        # Check if vote is marked as synchronized
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/statistics")
-        self.assertEqual(200, response.status_code)
-        statistics_result = response.json()
-
-        self.assertTrue(statistics_result["statistics"]["all_count"] == all_votes_count)
-        self.assertTrue(statistics_result["statistics"]["syncronized_count"] == synchronized_votes_count)
-        self.assertTrue(statistics_result["statistics"]["unsyncronized_count"] == unsynchronized_votes_count)
-
-        # Check server statistics
-        response = requests.get(SERVER_URL + "elastic/synchronization-status")
-        election_status = response.json()
-
-        # There is +1 vote in server because of initial seed
-        self.assertTrue(election_status["data"]["total_votes"] == all_votes_count + 1)
-
-        # Do elastic search synchronize
-        response = requests.post(SERVER_URL + "elastic/synchronize-votes-es", json = {"number": 100})
-        synchronize_response = response.json()
-
-        self.assertTrue(SYNCHRONIZATION_MESSAGE in synchronize_response["message"])
+        with step("vote_submission"):
+            summary_page.send_vote()
 
-        # Check votes in statistics app
-        driver.get(STATISTICS_URL)
-        find_element(driver, "//main", by = By.XPATH)
-
-        # Check count of all votes
-        find_element(driver, "//div[contains(@class, 'elections-statistics')]//tbody[//th[text() = 'Počet hlasov spolu:'] and //td[text() = '%s']]" % str(all_votes_count + 1), by = By.XPATH)
+        ledger.record(token, party = "SME RODINA")
 
-        # Check if SME RODINA gets votes in Bratislavsky kraj
-        find_element(driver, "//section[contains(@class, 'regional-winners-cards')]/div/div/div[//span[text() = 'Bratislavský kraj'] and //div[text() = 'SME RODINA']]", by = By.XPATH, longDelay = True)
+        # Check gateway, server and statistics app in batches of votes
+        if ledger.reconcile_due():
+            self.assertEqual([], synchronize_and_reconcile(ledger, driver))
 
 
     def test_select_party_and_candidates (self):
-        global all_votes_count
-        global synchronized_votes_count
-        global unsynchronized_votes_count
-
         driver = self.driver
 
         # Get token
-        response = requests.post(GATEWAY_URL + "token-manager-api/tokens/create")
-        self.passing = self.assertEqual(200, response.status_code)
-        token = response.json()["token"]
+        with step("create_token"):
+            response = http_client.gateway.post("token-manager-api/tokens/create")
+            self.passing = self.assertEqual(200, response.status_code)
+            token = response.json()["token"]
 
         # Activate token
-        response = requests.post(GATEWAY_URL + 'token-manager-api/tokens/writer/update', json = {"token": token})
-        self.passing = self.assertEqual(200, response.status_code)
+        with step("activate_token"):
+            response = http_client.gateway.post('token-manager-api/tokens/writer/update', json = {"token": token})
+            self.passing = self.assertEqual(200, response.status_code)
 
-        response = requests.post(VT_BACKEND_URL + "token", json = token)
-        self.passing = self.assertEqual(200, response.status_code)
+        # Use token
+        with step("insert_token"):
+            response = http_client.vt.post("backend/token", json = token)
+            self.passing = self.assertEqual(200, response.status_code)
 
         # Get candidating parties
-        driver.get(VT_FRONTEND_URL + "parliament/party")
-
-        find_element(driver, "//h2[text()='Kandidujúce strany:']", by = By.XPATH)
+        party_page = PartyPage(driver)
+        with step("party_page_render"):
+            party_page.open()
 
         # Decide for Sme Rodina party
-        element = find_clickable_element(driver, "(//input[@type='checkbox'])[4]", by = By.XPATH)
-        click_on(driver, element)
+        party_page.select_party(4)
+        party_page.confirm()
 
-        element = find_clickable_element(driver, "//button[text()='Potvrdiť']", by = By.XPATH)
-        click_on(driver, element)
-
-        find_element(driver, "modal-content")
-        self.assertTrue(is_text_present(driver, "Zvolili ste"))
-        self.assertTrue(is_text_present(driver, "SME RODINA"))
-        element = find_clickable_element(driver, "(//button[text()='Potvrdiť'])[2]", by = By.XPATH)
-        click_on(driver, element)
+        party_page.find(PartyPage.MODAL)
+        self.assertEqual([], party_page.missing_texts(["Zvolili ste", "SME RODINA"]))
+        party_page.confirm_party()
 
         # List of candidates present
-        find_element(driver, "//h2[text()='Kandidáti']", by = By.XPATH)
-        find_element(driver, "//span[text()='Meno']", by = By.XPATH)
-        self.assertTrue(is_text_present(driver, "Boris Kollár"))
+        candidate_page = CandidatePage(driver)
+        candidate_page.wait_for_candidates()
+        self.assertEqual([], candidate_page.missing_texts(["Boris Kollár"]))
 
         # Select candidates
-        element = find_clickable_element(driver, "(//input[@type='checkbox'])[1]", by = By.XPATH)
-        click_on(driver, element)
+        candidate_page.select_candidate(1)
 
-        self.assertTrue(is_text_present(driver, "Ešte môžete zvoliť 4 kandidátov"))
+        self.assertEqual([], candidate_page.missing_texts(["Ešte môžete zvoliť 4 kandidátov"]))
 
-        element = find_clickable_element(driver, "next")
-        click_on(driver, element)
+        candidate_page.next_page()
 
-        self.assertTrue(is_text_present(driver, "Ľuboš Krajčír"))
+        self.assertEqual([], candidate_page.missing_texts(["Ľuboš Krajčír"]))
 
-        element = find_clickable_element(driver, "next")
-        click_on(driver, element)
+        candidate_page.next_page()
 
-        self.assertTrue(is_text_present(driver, "Jozef Mozol"))
-        element = find_clickable_element(driver, "(//input[@type='checkbox'])[1]", by = By.XPATH)
-        click_on(driver, element)
+        self.assertEqual([], candidate_page.missing_texts(["Jozef Mozol"]))
+        candidate_page.select_candidate(1)
 
-        self.assertTrue(is_text_present(driver, "Ešte môžete zvoliť 3 kandidátov"))
+        self.assertEqual([], candidate_page.missing_texts(["Ešte môžete zvoliť 3 kandidátov"]))
 
-        element = find_clickable_element(driver, "//button[text()='Potvrdiť']", by = By.XPATH)
-        click_on(driver, element)
+        candidate_page.confirm()
 
         # Confirm selected candidates
-        self.assertTrue(is_text_present(driver, "Zvolili ste"))
-        self.assertTrue(is_text_present(driver, "Boris Kollár"))
-        self.assertTrue(is_text_present(driver, "Jozef Mozol"))
-        self.assertTrue(is_text_present(driver, "Ešte môžete zvoliť ďalších 3 kandidátov"))
-        element = find_clickable_element(driver, "//button[text()='Pokračovať']", by = By.XPATH)
-        click_on(driver, element)
+        self.assertEqual([], candidate_page.missing_texts(["Zvolili ste", "Boris Kollár", "Jozef Mozol", "Ešte môžete zvoliť ďalších 3 kandidátov"]))
+        candidate_page.continue_to_summary()
 
-        find_element(driver, "//h2[text()='Zvolená strana']", by = By.XPATH)
-        self.assertTrue(is_text_present(driver, "SME RODINA"))
-        self.assertTrue(is_text_present(driver, "Zvolení kandidáti na poslancov"))
-        self.assertTrue(is_text_present(driver, "Boris Kollár"))
-        self.assertTrue(is_text_present(driver, "Jozef Mozol"))
+        summary_page = SummaryPage(driver)
+        summary_page.find(SummaryPage.HEADING)
+        self.assertEqual([], summary_page.missing_texts(["SME RODINA", "Zvolení kandidáti na poslancov", "Boris Kollár", "Jozef Mozol"]))
 
         # Send vote
-        element = find_clickable_element(driver, "//button[text()='Odoslať hlas']", by = By.XPATH)
-        click_on(driver, element)
-
-        find_element(driver, "//div[text()='Váš hlas bol započítaný']", by = By.XPATH, longDelay = True)
-
-        all_votes_count += 1
-        unsynchronized_votes_count += 1
+        with step("vote_submission"):
+            summary_page.send_vote()
 
-        # Check if vote is saved in gateway
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/statistics")
-        self.assertEqual(200, response.status_code)
-        statistics_result = response.json()
+        ledger.record(token, party = "SME RODINA", candidates = ["Mgr. Boris Kollár", "Mgr. Jozef Mozol"])
 
-        self.assertTrue(statistics_result["statistics"]["all_count"] == all_votes_count)
-        self.assertTrue(statistics_result["statistics"]["syncronized_count"] == synchronized_votes_count)
-        self.assertTrue(statistics_result["statistics"]["unsyncronized_count"] == unsynchronized_votes_count)
+        # Check gateway, server and statistics app in batches of votes
+        if ledger.reconcile_due():
+            self.assertEqual([], synchronize_and_reconcile(ledger, driver))
 
-        # Synchronize votes in gateway with server
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/synchronize")
-        self.assertEqual(200, response.status_code)
 
-        unsynchronized_votes_count -= 1
-        synchronized_votes_count += 1
+    @unittest.skipUnless(SCENARIO_VOTES, "SCENARIO_VOTES not set")
+    def test_select_generated (self):
+        ballots = generate_ballots(load_catalogue(), SCENARIO_VOTES, int(SCENARIO_SEED) if SCENARIO_SEED else None)
+        voter = HttpVoter()
 
-        # Check if vote is marked as synchronized
-        response = requests.post(GATEWAY_URL + "synchronization-service-api/statistics")
-        self.assertEqual(200, response.status_code)
-        statistics_result = response.json()
+        for ballot in ballots:
+            with step("scenario_vote"):
+                cast_ballot_in_browser(self.driver, voter, ledger, ballot)
 
-        self.assertTrue(statistics_result["statistics"]["all_count"] == all_votes_count)
-        self.assertTrue(statistics_result["statistics"]["syncronized_count"] == synchronized_votes_count)
-        self.assertTrue(statistics_result["statistics"]["unsyncronized_count"] == unsynchronized_votes_count)
+            if ledger.reconcile_due():
+                self.assertEqual([], synchronize_and_reconcile(ledger, self.driver))
 
-        # Check server statistics
-        response = requests.get(SERVER_URL + "elastic/synchronization-status")
-        self.assertEqual(200, response.status_code)
-        election_status = response.json()
-
-        # There is +1 vote in server because of initial seed
-        self.assertTrue(election_status["data"]["total_votes"] == all_votes_count + 1)
+    def tearDown (self):
+        driver_pool.release(self.driver)
 
-        # Do elastic search synchronize
-        response = requests.post(SERVER_URL + "elastic/synchronize-votes-es", json = {"number": 100})
-        self.assertEqual(200, response.status_code)
-        synchronize_response = response.json()
+    @classmethod
+    def tearDownClass (cls):
+        # Check votes of last incomplete batch
+        if ledger.unreconciled():
+            driver = driver_pool.acquire()
+            try:
+                differences = synchronize_and_reconcile(ledger, driver)
+            finally:
+                driver_pool.release(driver)
 
-        self.assertTrue(SYNCHRONIZATION_MESSAGE in synchronize_response["message"])
+            if differences:
+                raise AssertionError("\n".join(differences))
 
-        # Check statistics app
-        driver.get(STATISTICS_URL)
-        find_element(driver, "//main", by = By.XPATH)
 
-        # Check count of all votes
-        find_element(driver, "//div[contains(@class, 'elections-statistics')]//tbody[//th[text() = 'Počet hlasov spolu:'] and //td[text() = '%s']]" % str(all_votes_count + 1), by = By.XPATH)
+def tearDownModule ():
+    driver_pool.close()
+    write_report()
+    browser_summary = browser_timing.write_report()
 
-        # Check if SME RODINA gets votes
-        find_element(driver, "//section[contains(@class, 'regional-winners-cards')]/div/div/div[//span[text() = 'Bratislavský kraj'] and //div[text() = 'SME RODINA']]", by = By.XPATH, longDelay=True)
+    # Keep metrics of run for comparison with baseline
+    save_run("tests", dict(prefixed(recorder.samples, "step."), **prefixed(browser_timing.recorder.samples, "browser.")))
 
-        # Check if selected candidates get votes
-        find_element(driver, "//div[contains(@class, 'candidates-table')]/div/div[//td[text() = 'Mgr. Boris Kollár'] and //td[text() = 'Mgr. Jozef Mozol']]", by = By.XPATH, longDelay=True)
-
-
-    def tearDown (self):
-        self.driver.close()
+    # Fail run when page got slower than its budget
+    violations = browser_timing.check_budgets(browser_summary, browser_timing.load_budgets())
+    if violations:
+        raise AssertionError("\n".join(violations))
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level = os.getenv("LOG_LEVEL", "INFO"), format = "%(asctime)s %(name)s: %(message)s")
+
     # Exit if any fail
     unittest.main(failfast = True)
 
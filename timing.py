@@ -0,0 +1,39 @@
+import os
+import csv
+import json
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from metrics import LatencyRecorder
+
+load_dotenv()
+TIMING_REPORT_PATH = os.getenv("TIMING_REPORT_PATH", "timing_report.json")
+
+REPORT_COLUMNS = ["count", "min", "median", "p95", "p99", "max"]
+
+recorder = LatencyRecorder()
+
+
+@contextmanager
+def step (name):
+    # Failed steps are not recorded, they would skew durations of a broken run
+    start = time.perf_counter()
+    yield
+    recorder.record(name, time.perf_counter() - start)
+
+
+def write_report (path = TIMING_REPORT_PATH, recorder = recorder):
+    summary = recorder.summary()
+
+    if path.endswith(".csv"):
+        with open(path, "w", newline = "") as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(["step"] + REPORT_COLUMNS)
+            for name, stats in summary.items():
+                writer.writerow([name] + [stats[column] for column in REPORT_COLUMNS])
+    else:
+        with open(path, "w") as report_file:
+            json.dump(summary, report_file, indent = 2)
+
+    return summary
@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+import requests
+from collections import Counter
+from dotenv import load_dotenv
+
+from config import GATEWAY_URL
+from http_client import ServiceClient
+from http_voting import HttpVoter, VotingError
+from metrics import LatencyRecorder
+from results_store import save_run, prefixed
+
+load_dotenv()
+TOKEN_PRODUCERS = int(os.getenv("TOKEN_PRODUCERS", "4"))
+TOKEN_QUEUE_SIZE = int(os.getenv("TOKEN_QUEUE_SIZE", "100"))
+TOKEN_WAIT_TIMEOUT = float(os.getenv("TOKEN_WAIT_TIMEOUT", "60")) # seconds
+
+
+class TokenProvisioner:
+    def __init__ (self, total = None, producers = TOKEN_PRODUCERS, queue_size = TOKEN_QUEUE_SIZE, gateway = None):
+        # Pool sized so that every producer keeps its connection alive
+        self.gateway = gateway or ServiceClient("gateway", GATEWAY_URL, pool_size = producers)
+        self.voter = HttpVoter(gateway = self.gateway)
+        self.total = total # None produces until stopped
+        self.producers = producers
+        self.tokens = queue.Queue(maxsize = queue_size)
+        self.recorder = LatencyRecorder()
+        self.errors = Counter()
+        self.claimed = 0
+        self.produced = 0
+        self.started = None
+        self.last_produced = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def start (self):
+        self.started = time.perf_counter()
+        self.threads = [threading.Thread(target = self.produce, daemon = True) for i in range(self.producers)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def claim (self):
+        with self.lock:
+            if self.total is not None and self.claimed >= self.total:
+                return False
+            self.claimed += 1
+            return True
+
+    def produce (self):
+        while not self.stopped.is_set() and self.claim():
+            try:
+                start = time.perf_counter()
+                token = self.voter.create_token()
+                self.recorder.record("create_token", time.perf_counter() - start)
+
+                start = time.perf_counter()
+                self.voter.activate_token(token)
+                self.recorder.record("activate_token", time.perf_counter() - start)
+            except VotingError as e:
+                with self.lock:
+                    self.errors[e.step] += 1
+                continue
+            except requests.RequestException as e:
+                with self.lock:
+                    self.errors[type(e).__name__] += 1
+                continue
+
+            with self.lock:
+                self.produced += 1
+                self.last_produced = time.perf_counter()
+
+            # Full queue holds producers back until voting catches up
+            while not self.stopped.is_set():
+                try:
+                    self.tokens.put(token, timeout = 0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def get (self, timeout = TOKEN_WAIT_TIMEOUT):
+        return self.tokens.get(timeout = timeout)
+
+    def done (self):
+        return not any(thread.is_alive() for thread in self.threads)
+
+    def stop (self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def report (self):
+        elapsed = (self.last_produced or time.perf_counter()) - self.started if self.started else 0
+
+        return {
+            "producers": self.producers,
+            "produced": self.produced,
+            "failed": sum(self.errors.values()),
+            "errors": dict(self.errors),
+            "elapsed": elapsed,
+            "throughput": self.produced / elapsed if elapsed else 0,
+            "latencies": self.recorder.summary(),
+        }
+
+
+def print_report (report):
+    print("Tokens: %d created and activated, %d failed by %d producers in %.2f s (%.1f tokens/s)" % (report["produced"], report["failed"], report["producers"], report["elapsed"], report["throughput"]))
+
+    for step, count in report["errors"].items():
+        print("  errors %-16s %d" % (step, count))
+
+    for step, stats in report["latencies"].items():
+        print("  %-16s median %.1f ms, p95 %.1f ms, p99 %.1f ms, max %.1f ms" % (step, stats["median"] * 1000, stats["p95"] * 1000, stats["p99"] * 1000, stats["max"] * 1000))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Measure token manager create and activate throughput with concurrent producers")
+    parser.add_argument("--tokens", type = int, default = 1000)
+    parser.add_argument("--producers", type = int, default = TOKEN_PRODUCERS)
+    parser.add_argument("--queue", type = int, default = TOKEN_QUEUE_SIZE)
+    args = parser.parse_args()
+
+    provisioner = TokenProvisioner(args.tokens, args.producers, args.queue).start()
+
+    # Tokens are not used, keep queue empty so producers run at full speed
+    while not provisioner.done() or not provisioner.tokens.empty():
+        try:
+            provisioner.tokens.get(timeout = 0.1)
+        except queue.Empty:
+            pass
+    provisioner.stop()
+
+    report = provisioner.report()
+    print_report(report)
+
+    metrics = prefixed(provisioner.recorder.samples, "token.")
+    metrics["token.throughput"] = [report["throughput"]]
+    save_run("token_pool", metrics)
+
+    if report["failed"]:
+        sys.exit(1)
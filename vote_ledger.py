@@ -0,0 +1,290 @@
+import os
+import time
+import threading
+from collections import Counter, namedtuple
+from dotenv import load_dotenv
+
+import requests
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
+
+import http_client
+from config import STATISTICS_URL
+from selenium_helper import find_element, open_page
+from browser_timing import capture_navigation
+from timing import step
+from stack_api import StackApiError, ELASTIC_BATCH_SIZE, gateway_statistics, gateway_synchronize, elastic_status, elastic_pending, elastic_synchronize, elastic_synchronized
+
+load_dotenv()
+VT_REGION = os.getenv("VT_REGION", "Bratislavský kraj")
+RECONCILE_EVERY = int(os.getenv("RECONCILE_EVERY", "1")) # votes
+SERVER_RESULTS_PATH = os.getenv("SERVER_RESULTS_PATH", "") # server endpoint with party and candidate counts, empty skips tallies
+
+# Server is seeded with one vote in set up
+SERVER_SEED_VOTES = 1
+
+TOTAL_VOTES_XPATH = "//div[contains(@class, 'elections-statistics')]//tbody[//th[text() = 'Počet hlasov spolu:'] and //td[text() = '%s']]"
+REGIONAL_WINNER_XPATH = "//section[contains(@class, 'regional-winners-cards')]/div/div/div[//span[text() = '%s'] and //div[text() = '%s']]"
+CANDIDATE_XPATH = "//div[contains(@class, 'candidates-table')]/div/div[//td[text() = '%s']]"
+
+PARTY_NAME_KEYS = ("name", "party", "party_name")
+VOTE_COUNT_KEYS = ("votes", "count", "vote_count", "doc_count")
+
+VoteRecord = namedtuple("VoteRecord", ["token", "party", "candidates", "terminal", "region", "timestamp"])
+
+
+def describe_vote (index, vote):
+    return "vote #%d (token %s, party %s, candidates %s, terminal %s, cast %s)" % (
+        index + 1,
+        vote.token,
+        vote.party or "-",
+        ", ".join(vote.candidates) or "-",
+        vote.terminal,
+        time.strftime("%H:%M:%S", time.localtime(vote.timestamp)),
+    )
+
+
+def first_value (item, keys):
+    for key in keys:
+        if key in item:
+            return item[key]
+    return None
+
+
+def candidate_name (candidate):
+    # Same name as statistics app shows, degrees included
+    if "name" in candidate:
+        return candidate["name"]
+    return ("%s %s %s" % (candidate.get("degrees_before") or "", candidate["first_name"], candidate["last_name"])).strip()
+
+
+def parse_results (data):
+    # List of parties with their candidates, bare or wrapped in data and parties
+    if isinstance(data, dict):
+        data = data.get("data", data)
+    if isinstance(data, dict):
+        data = data.get("parties", [])
+
+    parties = Counter()
+    candidates = Counter()
+    for party in data:
+        parties[first_value(party, PARTY_NAME_KEYS)] += int(first_value(party, VOTE_COUNT_KEYS) or 0)
+        for candidate in party.get("candidates", []):
+            candidates[candidate_name(candidate)] += int(first_value(candidate, VOTE_COUNT_KEYS) or 0)
+
+    # Zero counts compare equal to missing entries
+    return +parties, +candidates
+
+
+def read_results (path = SERVER_RESULTS_PATH):
+    try:
+        response = http_client.server.get(path)
+    except requests.RequestException as e:
+        return None, "SERVER results failed: %s" % e
+    if response.status_code != 200:
+        return None, "SERVER results failed with status %s" % response.status_code
+
+    try:
+        return parse_results(response.json()), None
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return None, "SERVER results have unexpected format: %s" % e
+
+
+class VoteLedger:
+    def __init__ (self, server_seed_votes = SERVER_SEED_VOTES, reconcile_every = RECONCILE_EVERY, gateway_votes = 0, baseline_results = None, baseline_error = None):
+        # Votes stack already had when ledger started, all synchronized
+        self.server_seed_votes = server_seed_votes
+        self.gateway_votes = gateway_votes
+        self.baseline_results = baseline_results
+        self.baseline_error = baseline_error
+        self.reconcile_every = reconcile_every
+        self.votes = []
+        self.synchronized = 0
+        self.reconciled = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_stack (cls, reconcile_every = RECONCILE_EVERY):
+        # Synchronize and index earlier votes so that only new votes are pending
+        response = gateway_synchronize()
+        if response.status_code != 200:
+            raise SystemExit("GATEWAY synchronize failed with status %s" % response.status_code)
+
+        try:
+            statistics = gateway_statistics()
+            server_status = elastic_status()
+        except StackApiError as e:
+            raise SystemExit(str(e))
+
+        if elastic_pending(server_status):
+            response = elastic_synchronize(elastic_pending(server_status))
+            if response.status_code != 200:
+                raise SystemExit("SERVER elastic synchronization failed with status %s" % response.status_code)
+
+        # Party and candidate counts of earlier votes, checked later in reconcile_results
+        # Failed read is reported by reconcile, it must not stop the run
+        baseline_results, baseline_error = read_results() if SERVER_RESULTS_PATH else (None, None)
+
+        return cls(server_seed_votes = server_status["total_votes"], reconcile_every = reconcile_every, gateway_votes = statistics["all_count"], baseline_results = baseline_results, baseline_error = baseline_error)
+
+    def record (self, token, party = None, candidates = (), terminal = "vt", region = VT_REGION):
+        vote = VoteRecord(token, party, tuple(candidates), terminal, region, time.time())
+        with self.lock:
+            self.votes.append(vote)
+        return vote
+
+    def mark_synchronized (self):
+        with self.lock:
+            self.synchronized = len(self.votes)
+
+    def reconcile_due (self):
+        return len(self.votes) - self.reconciled >= self.reconcile_every
+
+    def unreconciled (self):
+        return len(self.votes) - self.reconciled
+
+    def expected_gateway_statistics (self):
+        return {
+            "all_count": self.gateway_votes + len(self.votes),
+            "syncronized_count": self.gateway_votes + self.synchronized,
+            "unsyncronized_count": len(self.votes) - self.synchronized,
+        }
+
+    def expected_server_total (self):
+        # Server gets only votes synchronized by gateway
+        return self.synchronized + self.server_seed_votes
+
+    def party_tally (self, region = None, votes = None):
+        return Counter(vote.party for vote in (self.votes if votes is None else votes) if vote.party and (region is None or vote.region == region))
+
+    def candidate_tally (self, votes = None):
+        return Counter(candidate for vote in (self.votes if votes is None else votes) for candidate in vote.candidates)
+
+    def regional_winner (self, region = VT_REGION, margin = 0):
+        # Winner only if lead over runner-up is larger than margin, e.g. votes of unknown parties stack had before
+        tally = self.party_tally(region).most_common(2) + [(None, 0)]
+        if not tally[0][0] or tally[0][1] - tally[1][1] <= margin:
+            return None
+        return tally[0][0]
+
+    def missing_votes (self, place, confirmed, expected):
+        # Counts are confirmed in casting order, so the newest votes are the ones missing
+        return ["%s not counted in %s" % (describe_vote(index, self.votes[index]), place) for index in range(max(0, confirmed), min(expected, len(self.votes)))]
+
+    def reconcile_gateway (self):
+        try:
+            statistics = gateway_statistics()
+        except StackApiError as e:
+            return [str(e)]
+
+        differences = []
+
+        for key, expected in self.expected_gateway_statistics().items():
+            if statistics[key] != expected:
+                differences.append("GATEWAY %s is %s, expected %s" % (key, statistics[key], expected))
+
+        differences += self.missing_votes("gateway", statistics["all_count"] - self.gateway_votes, len(self.votes))
+        differences += self.missing_votes("gateway synchronized", statistics["syncronized_count"] - self.gateway_votes, self.synchronized)
+
+        return differences
+
+    def reconcile_server (self):
+        try:
+            with step("server_synchronization_status"):
+                total_votes = elastic_status()["total_votes"]
+        except StackApiError as e:
+            return [str(e)]
+
+        expected = self.expected_server_total()
+
+        if total_votes == expected:
+            return []
+
+        differences = ["SERVER total_votes is %s, expected %s" % (total_votes, expected)]
+        return differences + self.missing_votes("server", total_votes - self.server_seed_votes, self.synchronized)
+
+    def reconcile_results (self):
+        if not SERVER_RESULTS_PATH:
+            return []
+        if self.baseline_results is None:
+            return ["SERVER results were not read when ledger started (%s), party and candidate tallies not checked" % self.baseline_error]
+
+        with step("server_results"):
+            results, error = read_results()
+        if error:
+            return [error]
+
+        # Server counts only votes synchronized by gateway
+        synchronized = self.votes[:self.synchronized]
+        differences = []
+
+        for kind, baseline, tally, observed in (
+            ("party", self.baseline_results[0], self.party_tally(votes = synchronized), results[0]),
+            ("candidate", self.baseline_results[1], self.candidate_tally(synchronized), results[1]),
+        ):
+            expected = baseline + tally
+            for name in sorted(set(expected) | set(observed)):
+                if observed[name] != expected[name]:
+                    differences.append("SERVER %s %s has %d votes, expected %d (%d cast in run)" % (kind, name, observed[name], expected[name], tally[name]))
+
+        return differences
+
+    def reconcile_statistics (self, driver):
+        differences = []
+
+        try:
+            with step("statistics_count_visible"):
+                open_page(driver, STATISTICS_URL)
+                find_element(driver, "//main", by = By.XPATH)
+                capture_navigation(driver, "statistics")
+
+                # Check count of all votes
+                find_element(driver, TOTAL_VOTES_XPATH % self.expected_server_total(), by = By.XPATH, key = TOTAL_VOTES_XPATH)
+        except TimeoutException:
+            differences.append("STATISTICS total is not %s" % self.expected_server_total())
+
+        # Votes stack had before could change the winner, check only clear leads
+        winner = self.regional_winner(margin = self.server_seed_votes)
+        if winner:
+            try:
+                find_element(driver, REGIONAL_WINNER_XPATH % (VT_REGION, winner), by = By.XPATH, longDelay = True, key = REGIONAL_WINNER_XPATH)
+            except TimeoutException:
+                differences.append("STATISTICS winner of %s is not %s" % (VT_REGION, winner))
+
+        for candidate in self.candidate_tally():
+            try:
+                find_element(driver, CANDIDATE_XPATH % candidate, by = By.XPATH, longDelay = True, key = CANDIDATE_XPATH)
+            except TimeoutException:
+                differences.append("STATISTICS candidate %s has no votes" % candidate)
+
+        return differences
+
+    def reconcile (self, driver = None):
+        differences = self.reconcile_gateway() + self.reconcile_server() + self.reconcile_results()
+
+        if driver is not None:
+            differences += self.reconcile_statistics(driver)
+
+        self.reconciled = len(self.votes)
+        return differences
+
+
+def synchronize_and_reconcile (ledger, driver = None):
+    # Check if votes are saved in gateway
+    differences = ledger.reconcile_gateway()
+
+    # Synchronize votes in gateway with server
+    with step("gateway_synchronize"):
+        response = gateway_synchronize()
+    if response.status_code != 200:
+        return differences + ["GATEWAY synchronize failed with status %s" % response.status_code]
+    ledger.mark_synchronized()
+
+    # Do elastic search synchronize
+    with step("elastic_synchronize"):
+        response = elastic_synchronize(max(ELASTIC_BATCH_SIZE, ledger.unreconciled()))
+    if not elastic_synchronized(response):
+        return differences + ["SERVER elastic synchronization failed with status %s" % response.status_code]
+
+    # Check gateway, server, its results and statistics app at once
+    return differences + ledger.reconcile(driver)
@@ -0,0 +1,125 @@
+from selenium.webdriver.common.by import By
+
+from config import VT_FRONTEND_URL
+from selenium_helper import click_on, find_element, find_clickable_element, missing_texts, open_page
+from browser_timing import capture_navigation, timed_click
+
+CONFIRM_BUTTON = (By.XPATH, "//button[text()='Potvrdiť']")
+CONTINUE_BUTTON = (By.XPATH, "//button[text()='Pokračovať']")
+
+CHECKBOX_XPATH = "(//input[@type='checkbox'])[%d]"
+# Checkbox in the closest element that contains both label and checkbox
+LABELLED_CHECKBOX_XPATH = "//*[normalize-space(text()) = '%s']/ancestor::*[.//input[@type='checkbox']][1]//input[@type='checkbox']"
+
+_checkbox_locators = {}
+_labelled_checkbox_locators = {}
+# Waits for locators built from template share history of the template
+_wait_keys = {}
+
+
+def checkbox (index):
+    if index not in _checkbox_locators:
+        _checkbox_locators[index] = (By.XPATH, CHECKBOX_XPATH % index)
+        _wait_keys[CHECKBOX_XPATH % index] = CHECKBOX_XPATH
+    return _checkbox_locators[index]
+
+
+def labelled_checkbox (label):
+    if label not in _labelled_checkbox_locators:
+        _labelled_checkbox_locators[label] = (By.XPATH, LABELLED_CHECKBOX_XPATH % label)
+        _wait_keys[LABELLED_CHECKBOX_XPATH % label] = LABELLED_CHECKBOX_XPATH
+    return _labelled_checkbox_locators[label]
+
+
+class VtPage:
+    def __init__ (self, driver):
+        self.driver = driver
+
+    def find (self, locator, longDelay = False):
+        by, identifier = locator
+        return find_element(self.driver, identifier, by = by, longDelay = longDelay, key = _wait_keys.get(identifier))
+
+    def click (self, locator, measure_as = None, ready = None):
+        by, identifier = locator
+        element = find_clickable_element(self.driver, identifier, by = by, key = _wait_keys.get(identifier))
+
+        # Key clicks are timed in browser until page is ready again
+        if measure_as is not None:
+            timed_click(self.driver, measure_as, element, ready)
+            return
+
+        click_on(self.driver, element)
+        if ready is not None:
+            ready()
+
+    def missing_texts (self, texts, scope = None):
+        return missing_texts(self.driver, texts, self.find(scope) if scope else None)
+
+    def confirm (self):
+        self.click(CONFIRM_BUTTON)
+
+
+class PartyPage (VtPage):
+    URL = VT_FRONTEND_URL + "parliament/party"
+    HEADING = (By.XPATH, "//h2[text()='Kandidujúce strany:']")
+    MODAL = (By.CLASS_NAME, "modal-content")
+    MODAL_CONFIRM = (By.XPATH, "(//button[text()='Potvrdiť'])[2]")
+    SEND_EMPTY = (By.XPATH, "//button[text()='Odoslať prázdny hlas']")
+
+    def open (self):
+        open_page(self.driver, self.URL)
+        self.find(self.HEADING)
+        capture_navigation(self.driver, "party")
+
+    def select_party (self, index):
+        self.click(checkbox(index))
+
+    def select_party_by_name (self, name):
+        self.click(labelled_checkbox(name))
+
+    def confirm_party (self):
+        self.click(self.MODAL_CONFIRM, "party_confirm", CandidatePage(self.driver).wait_for_candidates)
+
+
+class CandidatePage (VtPage):
+    HEADING = (By.XPATH, "//h2[text()='Kandidáti']")
+    NAME_COLUMN = (By.XPATH, "//span[text()='Meno']")
+    NEXT = (By.CLASS_NAME, "next")
+
+    def wait_for_candidates (self):
+        self.find(self.HEADING)
+        self.find(self.NAME_COLUMN)
+
+    def select_candidate (self, index):
+        self.click(checkbox(index))
+
+    def select_candidate_by_name (self, name, max_pages = 20):
+        by, identifier = labelled_checkbox(name)
+
+        # Candidates are paginated, look through following pages only,
+        # so candidates have to be selected in order of the list
+        for page in range(max_pages):
+            elements = self.driver.find_elements(by, identifier)
+            if elements:
+                click_on(self.driver, elements[0])
+                return
+            self.next_page()
+
+        raise ValueError("Candidate %s not found" % name)
+
+    def next_page (self):
+        self.click(self.NEXT, "candidate_next")
+
+    def continue_to_summary (self):
+        self.click(CONTINUE_BUTTON)
+
+
+class SummaryPage (VtPage):
+    HEADING = (By.XPATH, "//h2[text()='Zvolená strana']")
+    NO_PARTY = (By.XPATH, "//div[text()='Nezvolili ste žiadnu politickú stranu']")
+    NO_CANDIDATE = (By.XPATH, "//div[text()='Nezvolili ste žiadneho kandidáta']")
+    SEND = (By.XPATH, "//button[text()='Odoslať hlas']")
+    VOTE_COUNTED = (By.XPATH, "//div[text()='Váš hlas bol započítaný']")
+
+    def send_vote (self):
+        self.click(self.SEND, "vote_send", lambda: self.find(self.VOTE_COUNTED, longDelay = True))